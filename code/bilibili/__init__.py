@@ -1 +1,8 @@
-from . import space
+import importlib
+
+
+# subpackages are imported on first access, `import bilibili` stays cheap
+def __getattr__(name):
+    if name in ('auto', 'bench', 'space', 'utils'):
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,43 @@
+'''Command line of the crawler
+
+Example:
+    $ python -m bilibili crawl jobs.txt -o out -p 8 --compress gzip
+'''
+
+
+
+import argparse
+import os
+import sys
+import time
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser('python -m bilibili', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    crawl = commands.add_parser('crawl', help='run the jobs of a job file')
+    crawl.add_argument('jobfile', help='lines of "<type> <id>", types: videos, followers, '
+        'followings, dynamics, comments, rooms, profiles')
+    crawl.add_argument('-o', '--output', default='output', help='directory of the JSON Lines files')
+    crawl.add_argument('-p', '--processes', type=int, default=os.cpu_count(), help='worker processes')
+    crawl.add_argument('--compress', choices=('gzip', ), default=None)
+    crawl.add_argument('--rate', type=float, default=None, help='requests per second of each host, all processes together')
+    args = parser.parse_args(argv)
+
+    from .crawl import crawl, read_jobs
+    try:
+        jobs = read_jobs(args.jobfile)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    start = time.monotonic()
+    counts = crawl(jobs, args.output, args.processes, args.compress, args.rate)
+    for type, count in sorted(counts.items()):
+        print(f'{type:>10} {count:>10}')
+    print(f'{len(jobs)} jobs in {time.monotonic()-start:.1f} s, output in {args.output}')
+    return 0
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
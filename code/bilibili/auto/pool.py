@@ -0,0 +1,169 @@
+import concurrent.futures
+import itertools
+import queue
+import threading
+import warnings
+
+from .tests import Auto
+
+
+
+class BrowserPool:
+    '''Pool of browsers sharing a queue of jobs
+
+    Each worker thread drives its own browser, a separate process, so jobs
+    run in parallel. Browsers are started on first use, logged in with
+    `cookies`, and replaced when one dies.
+
+    Argument:
+        - size: int, number of browsers
+        - web_driver: str, e.g. 'Chrome' or 'Firefox'
+        - headless: bool
+        - cookies: [list, None], cookies of a logged-in browser, e.g.
+            `browser.get_cookies()`
+
+    API:
+        - function
+            - submit(job, *args) -> Future
+            - map(job, items) -> iterator of (item, result)
+            - close()
+
+    Example:
+        >>> with BrowserPool(4, cookies=browser.get_cookies()) as pool:
+        ...     for url, name in pool.map(greet, live.urls):
+        ...         print(name)
+    '''
+
+    def __init__(self, size=4, web_driver='Chrome', headless=True, cookies=None):
+        self.size = size
+        self.web_driver = web_driver
+        self.headless = headless
+        self.cookies = list(cookies or ())
+        self._autos = list()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(size)
+
+
+    def __repr__(self):
+        return f'<BrowserPool @ {len(self._autos)}/{self.size} browsers>'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def submit(self, job, *args):
+        '''Run `job(auto, *args)` in the first idle browser
+        '''
+        return self._executor.submit(self._run, job, args)
+
+
+    def map(self, job, items):
+        '''Run `job(auto, item)` for each item, yield `(item, result)` as jobs
+        complete; failed jobs are skipped with a warning
+        '''
+        pending = dict()
+        items = iter(items)
+        for item in items:
+            pending[self.submit(job, item)] = item
+            # a few jobs queued ahead of the browsers, not the whole input
+            if len(pending) >= 2*self.size:
+                break
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for next_item in itertools.islice(items, 1):
+                    pending[self.submit(job, next_item)] = next_item
+                try:
+                    yield item, future.result()
+                except Exception as e:
+                    warnings.warn(f'Job failed on {item}: {e}', Warning)
+
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            autos, self._autos = self._autos, list()
+        for auto in autos:
+            try:
+                auto._browser.quit()
+            except Exception:
+                pass
+
+
+    def _run(self, job, args):
+        auto = self._checkout()
+        try:
+            return job(auto, *args)
+        except Exception:
+            if not _alive(auto):
+                self._discard(auto)
+                auto = None
+            raise
+        finally:
+            auto is None or self._idle.put(auto)
+
+
+    def _checkout(self):
+        try:
+            auto = self._idle.get_nowait()
+        except queue.Empty:
+            auto = self._start() or self._idle.get()
+        # None wakes up a waiting worker once a dead browser was discarded
+        return auto if auto is not None else self._checkout()
+
+
+    def _start(self):
+        with self._lock:
+            if len(self._autos) >= self.size:
+                return None
+            # the slot is reserved while the browser starts
+            self._autos.append(None)
+        try:
+            auto = self._new_auto()
+        except Exception:
+            with self._lock:
+                self._autos.remove(None)
+            raise
+        with self._lock:
+            self._autos[self._autos.index(None)] = auto
+        return auto
+
+
+    def _discard(self, auto):
+        with self._lock:
+            self._autos.remove(auto)
+        self._idle.put(None)
+        try:
+            auto._browser.quit()
+        except Exception:
+            pass
+
+
+    def _new_auto(self):
+        from selenium import webdriver
+        options = getattr(webdriver, f'{self.web_driver}Options')()
+        if self.headless:
+            options.add_argument('-headless' if self.web_driver == 'Firefox' else '--headless')
+        browser = getattr(webdriver, self.web_driver)(options=options)
+        auto = Auto(login=False, web_driver=browser)
+        if self.cookies:
+            for cookie in self.cookies:
+                browser.add_cookie({key: cookie[key] for key in cookie if key != 'sameSite'})
+            browser.refresh()
+        return auto
+
+
+
+def _alive(auto):
+    try:
+        auto._browser.current_url
+        return True
+    except Exception:
+        return False
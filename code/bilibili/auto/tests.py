@@ -1,7 +1,4 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions
+import time
 
 from bilibili.space import Video, User
 
@@ -12,6 +9,8 @@ class Auto:
 
 
     def __init__(self, login=True, web_driver='Chrome'):
+        # selenium is imported where a browser is driven, it is slow to import
+        from selenium import webdriver
         # set browser
         if isinstance(web_driver, str):
             self._browser = getattr(webdriver, web_driver)()
@@ -49,39 +48,85 @@ class Auto:
                 self.like_videos_from_user(comment.user_id)
 
 
-    def like_videos_from_user(self, user_id):
-        for video in User(user_id).videos:
-            self._goto(self._video_url_from_id(video.id))
-            # self._wait(element_to_be_clickable=(By.CLASS_NAME, class_like))
-            self.like_this_video()
+    def like_videos_from_user(self, user_id, pool=None):
+        '''Like every video of a user, in the browsers of `pool` when given
+
+        Example:
+            >>> with BrowserPool(4, cookies=browser.get_cookies()) as pool:
+            ...     auto.like_videos_from_user(546195, pool)
+        '''
+        videos = User(user_id, False).videos
+        if pool is None:
+            for video in videos:
+                self.like_video(video.id)
+        else:
+            for _ in pool.map(lambda auto, video: auto.like_video(video.id), videos):
+                pass
+
+
+    def like_video(self, video_id):
+        self._goto(self._video_url_from_id(video_id))
+        self.like_this_video()
 
 
     def like_this_video(self):
+        from selenium.webdriver.common.by import By
         class_like = 'van-icon-videodetails_like'
         class_flag = 'like.on'
-        self._browser.implicitly_wait(10)
+        element = self._wait(10, element_to_be_clickable=(By.CLASS_NAME, class_like))
         if not self._browser.find_elements_by_class_name(class_flag):
-            element = self._browser.find_element_by_class_name(class_like)
             element.click()
 
 
+    def greet_live_room(self, url, texts, pause=1):
+        '''Send each of `texts` in the chat of a live room, return the name
+        of its streamer
+
+        `texts` may be a function of the name. Elements are waited for
+        instead of sleeping; `pause` seconds between messages keep clear of
+        the chat rate limit.
+
+        Example:
+            >>> auto.greet_live_room(url, lambda name: (f'晚上好呀，{name}～', ))
+        '''
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.wait import WebDriverWait
+        class_name = 'room-owner-username.live-skin-normal-a-text.dp-i-block.v-middle'
+        class_input = 'chat-input.border-box'
+        class_send = 'txt'
+        self._goto(url)
+        name = self._wait(10, visibility_of_element_located=(By.CLASS_NAME, class_name)).text
+        for index, text in enumerate(texts(name) if callable(texts) else texts):
+            index and time.sleep(pause)
+            chat = self._wait(10, element_to_be_clickable=(By.CLASS_NAME, class_input))
+            chat.send_keys(text)
+            self._wait(10, element_to_be_clickable=(By.CLASS_NAME, class_send)).click()
+            # the input is cleared once the message is sent
+            WebDriverWait(self._browser, 10).until(lambda _: not chat.get_attribute('value'))
+        return name
+
+
     def _goto(self, url):
         self._browser.get(url)
 
 
     def _wait(self, timeout=5, poll_frequency=0.5, **kwargs):
-        '''Web driver wait.
+        '''Web driver wait, return what the last condition returned.
 
         Argument:
             - timeout: [int, float]
             - poll_frequency: [int, float]
 
         Example:
-            >>> self._wait(element_to_be_clickable=(By.ID, '...'))
+            >>> element = self._wait(element_to_be_clickable=(By.ID, '...'))
         '''
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.wait import WebDriverWait
         wait =  WebDriverWait(self._browser, timeout, poll_frequency)
+        result = None
         for key, val in kwargs.items():
-            wait.until(getattr(expected_conditions, key)(val))
+            result = wait.until(getattr(expected_conditions, key)(val))
+        return result
 
 
     def _user_url_from_id(self, id):
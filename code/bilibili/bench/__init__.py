@@ -0,0 +1,5 @@
+__all__ = ('MockServer', )
+
+
+
+from .server import MockServer
@@ -0,0 +1,186 @@
+'''Benchmark the crawl paths against the local mock API
+
+Example:
+    $ python -m bilibili.bench --latency 0.05 --users 20
+    $ python -m bilibili.bench comments dynamics --error-rate 0.01 --memory
+'''
+
+
+
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from .server import MockServer
+from ..space import ProfileLoader, User, Video, hydrate, get_identity_map
+from ..utils.transport import Transport, get_transport, set_transport
+
+
+
+def videos(args):
+    return sum(len(list(User(mid, False).videos)) for mid in _mids(args))
+
+
+def followers(args):
+    return sum(len(list(User(mid, False).followers)) for mid in _mids(args))
+
+
+def info(args):
+    users = [User(mid, False) for mid in range(1, args.users*10+1)]
+    return len(hydrate(users, args.workers))
+
+
+def profiles(args):
+    loader = ProfileLoader(args.workers, cards=True)
+    return sum(1 for _ in loader.load(range(1, args.users*10+1)))
+
+
+def comments(args):
+    aids = [mid*100000 for mid in _mids(args)]
+    return sum(sum(1 for _ in Video(aid, False).crawl_comments(args.workers)) for aid in aids)
+
+
+def dynamics(args):
+    return sum(len(list(User(mid, False).dynamics)) for mid in _mids(args))
+
+
+def rooms(args):
+    from experimental_features.model import LiveByArea
+    return sum(len(list(LiveByArea(id).rooms)) for id in range(1, args.users+1))
+
+
+def areas(args):
+    from experimental_features.model import scan_areas
+    return sum(1 for _ in scan_areas(workers=args.workers))
+
+
+def async_videos(args):
+    from ..space.aio import AsyncUser
+    async def count(transport, mid):
+        return len([video async for video in AsyncUser(mid, transport, args.workers).videos])
+    return _aio(args, count)
+
+
+def async_comments(args):
+    from ..space.aio import AsyncVideo
+    async def count(transport, mid):
+        return len([comment async for comment in AsyncVideo(mid*100000, transport, args.workers).comments])
+    return _aio(args, count)
+
+
+SCENARIOS = dict(
+    videos=videos, followers=followers, info=info, profiles=profiles,
+    comments=comments, dynamics=dynamics, rooms=rooms, areas=areas,
+    async_videos=async_videos, async_comments=async_comments,
+)
+_async_latencies = list()  # latency of each async request of a scenario
+
+
+
+def _mids(args):
+    return range(1, args.users+1)
+
+
+def _aio(args, count):
+    # every user at once on an `AsyncTransport` to the server of the sync one
+    from ..space.aio import AsyncTransport
+    async def main():
+        hooks = [lambda event: _async_latencies.append(event.latency)]
+        redirect = get_transport().redirect
+        async with AsyncTransport(args.workers, args.workers, redirect=redirect, hooks=hooks) as transport:
+            return sum(await asyncio.gather(*(count(transport, mid) for mid in _mids(args))))
+    return asyncio.run(main())
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values)-1, int(q*len(values)))]
+
+
+def _timed(transport):
+    # latency of every HTTP request, retries included one by one
+    latencies, lock, request = list(), threading.Lock(), transport.request
+    def timed_request(method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return request(method, url, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+    transport.request = timed_request
+    return latencies
+
+
+def run(name, args, server):
+    items, requests, elapsed, latencies = _pass(name, args, server)
+    peak = None
+    if args.memory:
+        # a second pass, tracemalloc slows every allocation down a lot
+        tracemalloc.start()
+        _pass(name, args, server)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return dict(
+        scenario=name, items=items, requests=requests, seconds=elapsed,
+        rps=requests/elapsed, p50=_percentile(latencies, 0.5)*1000,
+        p99=_percentile(latencies, 0.99)*1000, peak=peak and peak/2**20,
+    )
+
+
+def _pass(name, args, server):
+    transport = Transport(
+        pool_size=args.workers, redirect=server.redirect,
+        limiter=None if args.limit else False,
+    )
+    set_transport(transport)
+    get_identity_map().clear()
+    latencies = _timed(transport)
+    _async_latencies.clear()
+    server.counts.clear()
+    start = time.perf_counter()
+    items = SCENARIOS[name](args)
+    elapsed = time.perf_counter() - start
+    latencies.extend(_async_latencies)
+    transport.close()
+    return items, len(latencies), elapsed, latencies
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser('python -m bilibili.bench', description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help=f'any of {", ".join(SCENARIOS)}, default all')
+    parser.add_argument('--users', type=int, default=5, help='users, videos or areas per scenario')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=int, default=None, help='requests per second before -412')
+    parser.add_argument('--limit', action='store_true', help='keep the default rate limiter')
+    parser.add_argument('--memory', action='store_true', help='also measure the peak memory, in a second pass')
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios {", ".join(sorted(unknown))}')
+
+    server = MockServer(
+        latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, throttle=args.throttle,
+    )
+    header = ('scenario', 'items', 'requests', 'seconds', 'rps', 'p50 ms', 'p99 ms', 'peak MiB')
+    print(''.join(f'{name:>10}' for name in header))
+    with server:
+        for name in args.scenarios or list(SCENARIOS):
+            result = run(name, args, server)
+            print(''.join(
+                f'{value:>10.2f}' if isinstance(value, float) else f'{"-" if value is None else value:>10}'
+                    for value in result.values()
+            ))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''Measure the cold import time of the package against a budget
+
+Each statement runs in fresh interpreters; the best of `--runs` is kept.
+The exit status is 1 when a statement is over budget, so this can run in
+CI or before deploying a cron job.
+
+Example:
+    $ python -m bilibili.bench.imports --budget 0.3
+    $ python -m bilibili.bench.imports "from bilibili.space import User" --top 10
+'''
+
+
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+
+STATEMENTS = (
+    'from bilibili.space import User',
+    'import bilibili.utils.transport',
+    'from bilibili.auto.tests import Auto',
+    'import experimental_features',
+)
+
+
+
+def measure(statement, runs=5):
+    '''Return the best import time of `statement` in seconds, and
+    {module: cumulative seconds} of that run
+    '''
+    best, modules = None, None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            capture_output=True, text=True, cwd=_root(),
+        )
+        if result.returncode:
+            raise RuntimeError(f'{statement!r} failed:\n{result.stderr}')
+        times = _parse(result.stderr)
+        total = sum(seconds for module, seconds, level in times if level == 0)
+        if best is None or total < best:
+            best = total
+            modules = {module: seconds for module, seconds, level in times}
+    return best, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser('python -m bilibili.bench.imports', description=__doc__.splitlines()[0])
+    parser.add_argument('statements', nargs='*', help='default: the package entry points')
+    parser.add_argument('--budget', type=float, default=0.3, help='seconds per statement')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='slowest modules shown per statement')
+    args = parser.parse_args(argv)
+
+    over = False
+    for statement in args.statements or STATEMENTS:
+        seconds, modules = measure(statement, args.runs)
+        over |= seconds > args.budget
+        status = 'over budget' if seconds > args.budget else 'ok'
+        print(f'{seconds*1000:8.1f} ms  {status:<11}  {statement}')
+        for module, cumulative in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'{cumulative*1000:14.1f} ms  {module}')
+    return int(over)
+
+
+
+def _parse(stderr):
+    # "import time: self [us] | cumulative | imported package", nested by indent
+    times = list()
+    for line in stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+        if match:
+            cumulative, indent, module = match.groups()
+            times.append((module, int(cumulative)/1e6, len(indent)//2))
+    return times
+
+
+def _root():
+    # the directory `bilibili` is in, so that the checkout is imported
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+__all__ = ('MockServer', )
+
+
+
+import collections
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+
+
+class MockServer:
+    '''Local stand-in of the Bilibili API endpoints used by the models
+
+    Data are generated from the ids, so every run sees the same accounts.
+    All hosts are served by the same server, see `Transport(redirect=...)`.
+
+    Argument:
+        - latency: [int, float], seconds before each response
+        - jitter: [int, float], extra random seconds before each response
+        - videos, followers, comments, dynamics, rooms: int, number of
+            items of each list, per user, video or area
+        - replies: int, maximum number of replies of a root comment
+        - room_page_size: int, largest page size of `getRoomList`
+        - error_rate: float, probability of an HTTP 500 response
+        - throttle: [int, None], requests per second beyond which the
+            server answers code -412
+
+    API:
+        - property
+            - url: str
+            - counts: dict, {path: number of requests}
+        - function
+            - start()
+            - stop()
+
+    Example:
+        >>> with MockServer(latency=0.02) as server:
+        ...     set_transport(Transport(redirect=server.redirect))
+        ...     print(len(list(User(1, False).videos)))
+    '''
+
+    def __init__(self, latency=0.02, jitter=0.01, videos=300, followers=500,
+            comments=200, replies=12, dynamics=100, rooms=1000, room_page_size=99,
+            error_rate=0.0, throttle=None, port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.sizes = dict(
+            videos=videos, followers=followers, comments=comments,
+            replies=replies, dynamics=dynamics, rooms=rooms,
+        )
+        self.room_page_size = room_page_size
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.counts = collections.Counter()
+        self._window = [0, 0]  # second, number of requests in it
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', port), self._handler())
+        self._thread = None
+
+
+    def __repr__(self):
+        return f'<MockServer @ {self.url}>'
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+    @property
+    def redirect(self):
+        hosts = ('api.bilibili.com', 'api.vc.bilibili.com', 'api.live.bilibili.com')
+        return {host: self.url for host in hosts}
+
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+    def respond(self, path, query):
+        '''Return (status, body) of a request
+        '''
+        with self._lock:
+            self.counts[path] += 1
+            throttled = self._throttled()
+        time.sleep(self.latency + random.random()*self.jitter)
+        if random.random() < self.error_rate:
+            return 500, dict(code=-500, message='server error')
+        if throttled:
+            return 200, dict(code=-412, message='请求被拦截')
+        handler = self._ROUTES.get(path)
+        if handler is None:
+            return 404, dict(code=-404, message='not found')
+        return 200, dict(code=0, message='0', data=handler(self, query))
+
+
+    def _throttled(self):
+        if self.throttle is None:
+            return False
+        second = int(time.monotonic())
+        if self._window[0] != second:
+            self._window[:] = [second, 0]
+        self._window[1] += 1
+        return self._window[1] > self.throttle
+
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, as the real API
+            # headers and body in one send, flushed after each request, and
+            # TCP_NODELAY, else Nagle and delayed ACKs add ~40 ms per request
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+                status, body = server.respond(url.path, query)
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('content-type', 'application/json; charset=utf-8')
+                self.send_header('content-length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+    def _page(self, query, total, ps_name='ps', pn_name='pn', ps=20):
+        ps = int(query.get(ps_name, ps))
+        pn = int(query.get(pn_name, 1))
+        return range((pn-1)*ps, min(total, pn*ps)), ps
+
+
+    def _videos(self, query):
+        mid = int(query['mid'])
+        total = self.sizes['videos']
+        indices, _ = self._page(query, total, ps=30)
+        vlist = [
+            dict(
+                aid=mid*100000+i, mid=mid, title=f'video {i} of {mid}', pic='//i0.hdslb.com/x.jpg',
+                created=1585000000-i*3600, play=random.Random(i).randint(0, 10**6),
+                comment=i % 100, video_review=i % 50, length=f'{i%60:02d}:{i%59:02d}',
+                description='mock video',
+            )
+                for i in indices
+        ]
+        return dict(list=dict(vlist=vlist), page=dict(count=total, pn=query.get('pn'), ps=30))
+
+
+    def _relations(self, query):
+        vmid = int(query['vmid'])
+        total = self.sizes['followers']
+        indices, _ = self._page(query, total)
+        entries = [
+            dict(mid=(vmid*7919+i*104729) % 10**8 + 1, uname=f'user {i}', face='', sign='mock')
+                for i in indices
+        ]
+        return dict(list=entries, total=total)
+
+
+    def _account(self, query):
+        mid = int(query['mid'])
+        return dict(mid=mid, name=f'user {mid}', sex='保密', face='', sign='mock', level=mid % 7, birthday='01-01')
+
+
+    def _cards(self, query):
+        return [self._account(dict(mid=mid)) for mid in query['uids'].split(',')]
+
+
+    def _upstat(self, query):
+        return dict(archive=dict(view=1000), article=dict(view=10), likes=100)
+
+
+    def _relation_stat(self, query):
+        return dict(mid=int(query['vmid']), following=self.sizes['followers'], follower=self.sizes['followers'])
+
+
+    def _view(self, query):
+        aid = int(query['aid'])
+        stat = dict(view=aid % 10**6, danmaku=1, reply=2, favorite=3, coin=4, share=5, like=6)
+        return dict(
+            aid=aid, title=f'video {aid}', pic='', pubdate=1585000000, desc='mock', duration=60,
+            owner=dict(mid=aid//100000), stat=stat,
+        )
+
+
+    def _replies(self, query):
+        oid = int(query['oid'])
+        total = self.sizes['comments']
+        indices, ps = self._page(query, total, ps=20)
+        replies = [self._reply(oid*10**6+i, self._rcount(i)) for i in indices]
+        return dict(page=dict(num=query.get('pn'), size=20, count=total), replies=replies)
+
+
+    def _reply_replies(self, query):
+        root = int(query['root'])
+        total = self._rcount(root % 10**6)
+        indices, ps = self._page(query, total, ps=10)
+        replies = [self._reply(root*100+i, 0) for i in indices]
+        return dict(page=dict(num=query.get('pn'), size=ps, count=total), replies=replies)
+
+
+    def _rcount(self, index):
+        return random.Random(index).randint(0, self.sizes['replies'])
+
+
+    def _reply(self, rpid, rcount):
+        return dict(
+            rpid=rpid, rcount=rcount, ctime=1585000000+rpid % 10**6, like=rpid % 97,
+            member=dict(mid=str(rpid % 10**7 + 1)), content=dict(message=f'comment {rpid}'),
+        )
+
+
+    def _space_history(self, query):
+        uid = int(query['host_uid'])
+        total = self.sizes['dynamics']
+        offset = int(query.get('offset_dynamic_id', 0))
+        start = uid*10**6 + total
+        first = min(start, offset-1) if offset else start
+        ids = [id for id in range(first, first-12, -1) if id > uid*10**6]
+        cards = [dict(desc=self._desc(id, uid)) for id in ids]
+        has_more = int(bool(ids) and ids[-1] > uid*10**6+1)
+        return dict(cards=cards, has_more=has_more, next_offset=ids[-1] if ids else 0)
+
+
+    def _dynamic_detail(self, query):
+        id = int(query['dynamic_id'])
+        return dict(card=dict(desc=self._desc(id, id//10**6)))
+
+
+    def _desc(self, id, uid):
+        return dict(dynamic_id=id, uid=uid, view=id % 1000, repost=1, comment=2, like=3, timestamp=1585000000+id % 10**6)
+
+
+    def _rooms(self, query):
+        area = int(query['area_id'])
+        total = self.sizes['rooms']
+        ps = min(int(query.get('page_size', 30)), self.room_page_size)
+        indices, _ = self._page(query, total, 'page_size', 'page', ps)
+        rooms = [
+            dict(roomid=area*10**6+i, uname=f'streamer {i}', online=random.Random(i).randint(0, 10**4), area_name=f'area {area}')
+                for i in range(indices.start, min(total, indices.start+ps))
+        ]
+        return dict(count=total, list=rooms)
+
+
+    def _areas(self, query):
+        return [
+            dict(id=parent, name=f'parent {parent}', list=[
+                dict(id=parent*100+i, parent_id=parent, name=f'area {parent*100+i}')
+                    for i in range(1, 6)
+            ])
+                for parent in range(1, 4)
+        ]
+
+
+    _ROUTES = {
+        '/x/space/arc/search': _videos,
+        '/x/relation/followers': _relations,
+        '/x/relation/followings': _relations,
+        '/x/space/acc/info': _account,
+        '/x/space/upstat': _upstat,
+        '/account/v1/user/cards': _cards,
+        '/x/relation/stat': _relation_stat,
+        '/x/web-interface/view': _view,
+        '/x/v2/reply': _replies,
+        '/x/v2/reply/reply': _reply_replies,
+        '/dynamic_svr/v1/dynamic_svr/space_history': _space_history,
+        '/dynamic_svr/v1/dynamic_svr/get_dynamic_detail': _dynamic_detail,
+        '/room/v3/area/getRoomList': _rooms,
+        '/room/v1/Area/getList': _areas,
+    }
+
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # bursts of new connections are not dropped
@@ -0,0 +1,169 @@
+__all__ = ('JOBS', 'crawl', 'read_jobs', 'shard_of')
+
+
+
+import collections
+import concurrent.futures
+import glob
+import os
+import shutil
+import warnings
+import zlib
+
+from .space import ProfileLoader, User, Video
+from .utils.export import JSONLWriter, to_record
+
+
+
+def _videos(id):
+    return User(id, False).videos
+
+
+def _followers(id):
+    return User(id, False).followers
+
+
+def _followings(id):
+    return User(id, False).followings
+
+
+def _dynamics(id):
+    return User(id, False).dynamics
+
+
+def _comments(id):
+    return Video(id, False).crawl_comments()
+
+
+def _rooms(id):
+    from experimental_features.model import LiveByArea
+    return LiveByArea(id).rooms
+
+
+# {job type: function of an id returning an iterable of items}, profiles are
+# loaded together by `ProfileLoader`
+JOBS = dict(
+    videos=_videos, followers=_followers, followings=_followings,
+    dynamics=_dynamics, comments=_comments, rooms=_rooms, profiles=None,
+)
+
+
+
+def read_jobs(path):
+    '''Return [(type, id), ...] of a job file
+
+    Each line is a job type and an id (a mid, an aid or a live area id);
+    text after "#" and blank lines are ignored.
+
+    Example:
+        # job file
+        videos 546195
+        followers 546195
+        comments 170001
+        rooms 27
+    '''
+    jobs = list()
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) != 2 or fields[0] not in JOBS or not fields[1].isdigit():
+                raise ValueError(f'{path}:{number}: expected "<type> <id>", got {line!r}')
+            jobs.append((fields[0], int(fields[1])))
+    return jobs
+
+
+def shard_of(id, shards):
+    '''Return the shard of an id, stable across processes and runs, so that
+    every job about an id runs in the same process
+    '''
+    return zlib.crc32(str(id).encode()) % shards
+
+
+def crawl(jobs, output, processes=os.cpu_count(), compress=None, rate=None):
+    '''Run `jobs` in `processes` worker processes, sharded by id, and merge
+    their output into one JSON Lines file per job type in `output`
+
+    Each record gets a "job" field, the id of the job it comes from.
+
+    Argument:
+        - jobs: list of (type, id)
+        - output: str, directory of the output files
+        - processes: int, number of worker processes
+        - compress: [str, None], 'gzip' or None
+        - rate: [int, float, None], requests per second of each host, shared
+            by every process; None for the default limiter of each process
+
+    Example:
+        >>> crawl(read_jobs('jobs.txt'), 'out', processes=8)
+        {'videos': 3204, 'comments': 18442}
+    '''
+    os.makedirs(output, exist_ok=True)
+    shards = collections.defaultdict(list)
+    for type, id in dict.fromkeys(jobs):
+        shards[shard_of(id, processes)].append((type, id))
+    counts = collections.Counter()
+    # only shards with jobs share the rate
+    rate = rate and rate/max(len(shards), 1)
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = [
+            executor.submit(_crawl_shard, shard, shard_jobs, output, compress, rate)
+                for shard, shard_jobs in sorted(shards.items())
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            counts.update(future.result())
+    for type in counts:
+        _merge(output, type, compress)
+    return dict(counts)
+
+
+
+def _crawl_shard(shard, jobs, output, compress, rate):
+    if rate:
+        # only the limiter changes, cache, redirect and hooks of the
+        # transport the process has stay
+        from .utils.ratelimit import RateLimiter
+        from .utils.transport import get_transport
+        get_transport().limiter = RateLimiter(rate=rate, maximum=rate)
+    suffix = '.jsonl.gz' if compress else '.jsonl'
+    writers, counts = dict(), collections.Counter()
+    def write(type, id, item):
+        if type not in writers:
+            path = os.path.join(output, f'{type}-{shard:04d}{suffix}')
+            writers[type] = JSONLWriter(path, compress=compress)
+        writers[type].write(dict(to_record(item), job=id))
+        counts[type] += 1
+    try:
+        for type, id in jobs:
+            if type == 'profiles':
+                continue
+            try:
+                for item in JOBS[type](id):
+                    write(type, id, item)
+            except Exception as e:
+                warnings.warn(f'Job {type} {id} failed: {e}', Warning)
+        profiles = [id for type, id in jobs if type == 'profiles']
+        if profiles:
+            loader = ProfileLoader()
+            for user in loader.load(profiles):
+                write('profiles', user.id, user)
+            for id, errors in loader.failures.items():
+                warnings.warn(f'Job profiles {id} failed: {errors}', Warning)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def _merge(output, type, compress):
+    # gzip members can be concatenated as they are
+    suffix = '.jsonl.gz' if compress else '.jsonl'
+    parts = sorted(glob.glob(os.path.join(output, f'{type}-[0-9][0-9][0-9][0-9]{suffix}')))
+    with open(os.path.join(output, type + suffix), 'wb') as merged:
+        for part in parts:
+            with open(part, 'rb') as f:
+                shutil.copyfileobj(f, merged)
+    for part in parts:
+        os.remove(part)
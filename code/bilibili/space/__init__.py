@@ -1 +1,25 @@
-from .model import User, Video, Dynamic, Comment
+__all__ = (
+    'FeedFollower', 'GraphCrawler', 'IdentityMap', 'get_identity_map', 'set_identity_map',
+    'User', 'Video', 'Dynamic', 'Comment', 'hydrate', 'ProfileLoader',
+    'UserTable', 'VideoTable', 'CommentTable', 'CommentSync', 'StateStore',
+)
+
+
+import importlib
+
+
+# names are imported from their module on first access
+_MODULES = dict(
+    FeedFollower='feed', GraphCrawler='graph',
+    IdentityMap='identity', get_identity_map='identity', set_identity_map='identity',
+    User='model', Video='model', Dynamic='model', Comment='model', hydrate='model',
+    ProfileLoader='profiles',
+    UserTable='store', VideoTable='store', CommentTable='store',
+    CommentSync='sync', StateStore='state',
+)
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return getattr(importlib.import_module(f'.{_MODULES[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,477 @@
+__all__ = ('AsyncTransport', 'AsyncUser', 'AsyncVideo', 'AsyncDynamic', 'hydrate')
+
+
+
+import aiohttp
+import asyncio
+import collections
+import json
+import math
+import time
+import urllib.parse
+import warnings
+
+from .model import User, Video, Dynamic
+from ..utils.agents import user_agent
+from ..utils.metrics import Event, endpoint_of
+from ..utils.ratelimit import Backoff
+from ..utils.transport import (
+    get_transport, is_throttled, redirected, retry_after, retry_delay, transient_failure,
+)
+
+
+
+class AsyncTransport:
+    '''Asyncio HTTP transport shared by the async models
+
+    Requests are rate limited and retried as by `Transport`; by default they
+    take their tokens from the limiter of the process-wide transport, so the
+    sync and async clients share one budget per host.
+
+    Argument:
+        - concurrency: int, maximum number of requests in flight
+        - limit_per_host: int, maximum number of connections per host
+        - timeout: [int, float], timeout of each request in seconds
+        - hooks: iterable, functions called with an `Event` after each
+            `get_json`, as for `Transport`
+        - limiter: [RateLimiter, None, False], None for the limiter of
+            `get_transport()`, False to disable
+        - backoff: [Backoff, None], delays between retries of transient
+            failures; None for the default
+        - redirect: dict, {host: base url}, as for `Transport`
+
+    Example:
+        >>> async with AsyncTransport(concurrency=32) as transport:
+        ...     user = AsyncUser(546195, transport)
+        ...     async for video in user.videos:
+        ...         print(video)
+    '''
+
+    def __init__(self, concurrency=16, limit_per_host=8, timeout=10, hooks=(),
+            limiter=None, backoff=None, redirect=None):
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.hooks = list(hooks)
+        self.limiter = limiter
+        self.backoff = Backoff() if backoff is None else backoff
+        self.redirect = dict(redirect or ())
+        self._session = None
+        self._semaphore = None
+
+
+    def __repr__(self):
+        return f'<AsyncTransport @ {self.concurrency} in flight>'
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+    async def get_json(self, url, params=None, cookies=None):
+        '''Send a GET request and return the decoded JSON body
+        '''
+        start, data, error = time.perf_counter(), None, None
+        attempt = dict(status=None, bytes=0, retries=0)
+        try:
+            data = await self._get_json(url, params, cookies, attempt)
+            return data
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.hooks and self._emit(url, params, start, data, error, **attempt)
+
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+    async def _get_json(self, url, params, cookies, attempt):
+        # as `Transport._get_json`, waiting for tokens without blocking the loop
+        session = self._get_session()
+        limiter = get_transport().limiter if self.limiter is None else self.limiter
+        bucket = limiter and limiter.bucket(urllib.parse.urlsplit(url).hostname)
+        delays = iter(self.backoff)
+        while True:
+            while bucket:
+                wait = bucket.reserve()
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            attempt.update(status=None, bytes=0)
+            data, wait = None, None
+            try:
+                async with self._semaphore:
+                    async with session.get(redirected(url, self.redirect), params=params, cookies=cookies) as response:
+                        body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                attempt.update(status=response.status, bytes=len(body))
+                wait = retry_after(response)
+                failure = transient_failure(url, response.status)
+                if failure is None:
+                    data = json.loads(body)
+                    failure = transient_failure(url, response.status, data)
+                    if failure is None:
+                        bucket and bucket.success()
+                        return data
+                error = aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=failure,
+                )
+            delay = retry_delay(delays, bucket, is_throttled(attempt['status'], data), wait)
+            if delay is None:
+                raise error
+            attempt['retries'] += 1
+            await asyncio.sleep(delay)
+
+
+    def _emit(self, url, params, start, data, error, status=None, bytes=0, retries=0):
+        code = data.get('code') if isinstance(data, dict) else None
+        latency = time.perf_counter() - start
+        event = Event(endpoint_of(url), params, status, code, bytes, latency, retries, False, error)
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                warnings.warn(f'Hook {hook!r} failed: {e}', Warning)
+
+
+    def _get_session(self):
+        # created lazily so that it is bound to the running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'referer': 'https://www.bilibili.com',
+                    'user-agent': user_agent(),
+                },
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+
+
+class AsyncUser:
+    '''Asyncio version of `User`
+
+    API:
+        - property
+            - videos: async iterator
+            - followers: async iterator
+            - followings: async iterator
+            - dynamics: async iterator
+        - coroutine
+            - number_of_videos() -> int
+            - number_of_followers() -> int
+            - number_of_followings() -> int
+            - set_info()
+        - function
+            - set_cookies(cookies: dict)
+
+    Example:
+        >>> user = AsyncUser(546195, transport)
+        >>> await user.set_info()
+        >>> async for follower in user.followers:
+        ...     print(follower)
+    '''
+
+    def __init__(self, id, transport, window=4):
+        self.id = int(id)
+        self.info = None
+        self.partial = False
+        self.window = window
+        self._transport = transport
+        self._cookies = dict()
+
+
+    def __repr__(self):
+        if self.info:
+            return f'<AsyncUser("{self.info["name"]}") @ LV {self.info.get("level")}>'
+        else:
+            return f'<AsyncUser({self.id})>'
+
+
+    @classmethod
+    def from_entry(cls, entry, transport, window=4):
+        '''Build from an entry of the follower or following list
+        '''
+        self = cls(entry['mid'], transport, window)
+        self.info = User._entry_info(entry)
+        self.partial = True
+        return self
+
+
+    @property
+    def videos(self):
+        url = User._URL_VIDEO
+        keys = ('data', 'list', 'vlist')
+        items = self._data(url, ('data', 'page', 'count'), 30, 'pubdate', 'mid', keys)
+        return self._map(items, lambda entry: AsyncVideo.from_entry(entry, self._transport))
+
+
+    async def number_of_videos(self):
+        data = await self._data_at(User._URL_VIDEO, 1, 30, 'pubdate', 'mid')
+        return data['data']['page']['count']
+
+
+    @property
+    def followers(self):
+        url = User._URL_FOLLOWER
+        keys = ('data', 'list')
+        items = self._data(url, ('data', 'total'), 20, 'desc', 'vmid', keys)
+        return self._map(items, lambda entry: AsyncUser.from_entry(entry, self._transport))
+
+
+    async def number_of_followers(self):
+        data = await self._data_at(User._URL_FOLLOWER, 1, 20, 'desc', 'vmid')
+        return data['data']['total']
+
+
+    @property
+    def followings(self):
+        url = User._URL_FOLLOWING
+        keys = ('data', 'list')
+        items = self._data(url, ('data', 'total'), 20, 'desc', 'vmid', keys)
+        return self._map(items, lambda entry: AsyncUser.from_entry(entry, self._transport))
+
+
+    async def number_of_followings(self):
+        data = await self._data_at(User._URL_FOLLOWING, 1, 20, 'desc', 'vmid')
+        return data['data']['total']
+
+
+    @property
+    def dynamics(self):
+        return self._dynamics()
+
+
+    async def set_info(self):
+        '''Set information of current user, the three requests are concurrent
+        '''
+        if not self.info or self.partial:
+            requests = User._info_requests(self.id)
+            responses = await asyncio.gather(*(
+                self._get_json(url, params) for url, params, _ in requests
+            ))
+            info = dict(self.info or ())
+            for (_, _, parse), data in zip(requests, responses):
+                info.update(parse(data.get('data')))
+            self.info = info
+            self.partial = False
+
+
+    def set_cookies(self, cookies):
+        '''Set cookies sent by requests of current user with `cookies`
+        '''
+        self._cookies.update(cookies)
+
+
+    async def _map(self, items, function):
+        async for item in items:
+            yield function(item)
+
+
+    async def _data(self, url, count_keys, ps, order, id_name, keys):
+        # the first page gives the count, the others are run ahead in order
+        first_page = await self._data_at(url, 1, ps, order, id_name)
+        count = first_page
+        for key in count_keys:
+            count = count[key]
+        for entry in User._entries_at(first_page, keys):
+            yield entry
+        pages = (
+            self._data_at(url, page, ps, order, id_name)
+                for page in range(2, math.ceil(count/ps)+1)
+        )
+        async for data in _ordered(pages, self.window):
+            for entry in User._entries_at(data, keys):
+                yield entry
+
+
+    async def _data_at(self, url, page, ps, order, id_name):
+        params = dict(ps=ps, pn=page, order=order)
+        params[id_name] = self.id
+        return await self._get_json(url, params)
+
+
+    async def _dynamics(self):
+        url = 'https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/space_history'
+        params = dict(host_uid=self.id, offset_dynamic_id=0)
+        while True:
+            data = (await self._get_json(url, params))['data']
+            for card in data.get('cards') or ():
+                yield AsyncDynamic.from_desc(card.pop('desc'), self._transport)
+            if not data['has_more']:
+                break
+            params['offset_dynamic_id'] = data['next_offset']
+
+
+    async def _get_json(self, url, params):
+        return await self._transport.get_json(url, params, self._cookies)
+
+
+
+class AsyncVideo:
+    '''Asyncio version of `Video`
+
+    API:
+        - property
+            - comments: async iterator
+        - coroutine
+            - set_info()
+    '''
+
+    def __init__(self, id, transport, window=4):
+        self.id = int(id)
+        self.info = None
+        self.partial = False
+        self.window = window
+        self._transport = transport
+        self._timestamp = int(1000*time.time())
+
+
+    def __repr__(self):
+        if self.info:
+            return f'<AsyncVideo({self.info["title"]}) @ {self.info["view"]}>'
+        else:
+            return f'<AsyncVideo({self.id})>'
+
+
+    @classmethod
+    def from_entry(cls, entry, transport, window=4):
+        '''Build from an entry of `arc/search`
+        '''
+        self = cls(entry['aid'], transport, window)
+        self.info = Video._entry_info(entry)
+        self.partial = True
+        return self
+
+
+    @property
+    def comments(self):
+        '''
+        Example:
+            >>> async for comment in video.comments:
+            ...     print(comment)
+        '''
+        return self._comments()
+
+
+    async def set_info(self):
+        if not self.info or self.partial:
+            url = 'https://api.bilibili.com/x/web-interface/view'
+            data = await self._transport.get_json(url, dict(aid=self.id))
+            self.info = Video._view_info(data.get('data'))
+            self.partial = False
+
+
+    async def _comments(self, type=1):
+        first_page = await self._comments_data_at(1, type=type)
+        if not first_page['data']:
+            return
+        page_info = first_page['data']['page']
+        page_number = math.ceil(page_info['count']/page_info['size'])
+        pages = (
+            self._comments_data_at(page+1, type=type)
+                for page in range(page_number)
+        )
+        async for data in _ordered(pages, self.window):
+            async for comment in self._find_comments(data['data']['replies']):
+                yield comment
+
+
+    async def _comments_data_at(self, page, root=0, ps=10, sort=2, type=1):
+        url = 'https://api.bilibili.com/x/v2/reply'
+        params = dict(pn=page, type=type, oid=self.id, sort=sort, _=self._timestamp)
+        if root:
+            url += '/reply'
+            params.update(dict(root=root, ps=ps))
+        return await self._transport.get_json(url, params)
+
+
+    async def _find_comments(self, replies, ps=10):
+        for reply in replies or ():
+            yield Video._comment(reply)
+            rcount = reply['rcount']
+            if rcount:
+                pages = (
+                    self._comments_data_at(page+1, reply['rpid'], ps)
+                        for page in range(math.ceil(rcount/ps))
+                )
+                async for data in _ordered(pages, self.window):
+                    async for comment in self._find_comments(data['data']['replies']):
+                        yield comment
+
+
+
+class AsyncDynamic:
+    '''Asyncio version of `Dynamic`
+
+    API:
+        - coroutine
+            - set_info()
+    '''
+
+    def __init__(self, id, transport):
+        self.id = int(id)
+        self._transport = transport
+
+
+    def __repr__(self):
+        view = getattr(self, 'view', 'None')
+        return f'<AsyncDynamic({self.id} @ View {view})>'
+
+
+    @classmethod
+    def from_desc(cls, desc, transport):
+        self = cls(desc['dynamic_id'], transport)
+        for key, value in Dynamic._desc_info(desc).items():
+            setattr(self, key, value)
+        return self
+
+
+    async def set_info(self):
+        url = 'https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/get_dynamic_detail'
+        data = await self._transport.get_json(url, dict(dynamic_id=self.id))
+        for key, value in Dynamic._detail_info(data['data']['card']['desc']).items():
+            setattr(self, key, value)
+
+
+
+async def hydrate(objects):
+    '''Set information of many async models concurrently, bounded by the
+    concurrency of their transport
+
+    Example:
+        >>> followers = await hydrate([f async for f in user.followers])
+    '''
+    objects = list(objects)
+    await asyncio.gather(*(item.set_info() for item in objects))
+    return objects
+
+
+async def _ordered(coroutines, window):
+    '''Run at most `window` coroutines ahead, yield results in order
+    '''
+    tasks = collections.deque()
+    try:
+        for coroutine in coroutines:
+            tasks.append(asyncio.ensure_future(coroutine))
+            if len(tasks) >= window:
+                yield await tasks.popleft()
+        while tasks:
+            yield await tasks.popleft()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,159 @@
+__all__ = ('CommentCrawler', )
+
+
+
+import concurrent.futures
+import heapq
+import math
+import threading
+
+
+
+class CommentCrawler:
+    '''Concurrent crawler of the comment tree of a video
+
+    Root pages and reply pages are independent tasks of one thread pool, so
+    `workers` is the global limit of requests in flight. Pages are requested
+    as the consumer takes comments, at most `window` pages ahead of it.
+
+    Argument:
+        - video: Video
+        - workers: int, number of concurrent requests
+        - ordered: bool, yield comments in the order of `Video.comments`
+            instead of as soon as their page arrives
+        - progress: callable(done: int, total: int), called after each page,
+            `total` grows while reply pages are discovered
+        - window: [int, None], pages requested or buffered ahead of the
+            consumer, 2 per worker by default
+
+    Example:
+        >>> crawler = CommentCrawler(video, workers=16, progress=print)
+        >>> for comment in crawler:
+        ...     print(comment)
+    '''
+
+    def __init__(self, video, workers=8, ordered=False, progress=None, type=1, ps=10, window=None):
+        self.video = video
+        self.workers = workers
+        self.ordered = ordered
+        self.progress = progress
+        self.type = type
+        self.ps = ps
+        self.window = window or 2*workers
+        self.done = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<CommentCrawler({self.video.id}) @ {self.done}/{self.total} pages>'
+
+
+    def __iter__(self):
+        self.done, self.total = 0, 0
+        first_page = self.video._comments_data_at(1, type=self.type)
+        if not first_page['data']:
+            return
+        page_info = first_page['data']['page']
+        self._page_number = math.ceil(page_info['count']/page_info['size'])
+        self.total = self._page_number
+        # pages are keyed by their path in the tree, (root page, reply, page
+        # of the reply, ...), which sorts them in the order of the walk
+        self._queue = list()    # heap of keys of known pages
+        self._known = dict()    # {key: arguments of `_page`} not requested yet
+        self._futures = dict()  # {key: future} requested and not taken yet
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.workers)
+        try:
+            first = concurrent.futures.Future()
+            first.set_result(self._expand(first_page))
+            first.add_done_callback(self._on_done)
+            self._futures[(0, )] = first
+            if self._page_number > 1:
+                self._push((1, ), (2, 0))
+            self._fill()
+            yield from (self._walk() if self.ordered else self._stream())
+        finally:
+            for future in self._futures.values():
+                future.cancel()
+            self._executor.shutdown(wait=False)
+
+
+    def _push(self, key, arguments):
+        self._known[key] = arguments
+        heapq.heappush(self._queue, key)
+
+
+    def _submit(self, key):
+        future = self._executor.submit(self._page, *self._known.pop(key))
+        future.add_done_callback(self._on_done)
+        self._futures[key] = future
+        # the next root page is known once this one is requested
+        if len(key) == 1 and key[0]+1 < self._page_number:
+            self._push((key[0]+1, ), (key[0]+2, 0))
+
+
+    def _fill(self):
+        # at most `window` pages requested or buffered ahead of the consumer
+        while self._queue and len(self._futures) < self.window:
+            key = heapq.heappop(self._queue)
+            if key in self._known:
+                self._submit(key)
+
+
+    def _take(self, key):
+        if key in self._known:
+            # needed by the walk before the window reached it
+            self._submit(key)
+        items = self._futures.pop(key).result()
+        for index, (reply, children) in enumerate(items):
+            for number, arguments in enumerate(children):
+                self._push(key + (index, number), arguments)
+        with self._lock:
+            self.total += sum(len(children) for reply, children in items)
+        self._fill()
+        return items
+
+
+    def _on_done(self, future):
+        with self._lock:
+            self.done += 1
+            done, total = self.done, self.total
+        if self.progress and not future.cancelled():
+            self.progress(done, total)
+
+
+    def _page(self, page, root):
+        if root:
+            data = self.video._comments_data_at(page, root, self.ps, type=self.type)
+        else:
+            data = self.video._comments_data_at(page, type=self.type)
+        return self._expand(data)
+
+
+    def _expand(self, data):
+        # [(reply, [arguments of each page of its replies]), ...]
+        return [
+            (reply, [(page+1, reply['rpid']) for page in range(math.ceil(reply['rcount']/self.ps))])
+                for reply in data['data']['replies'] or ()
+        ]
+
+
+    def _stream(self):
+        while self._futures:
+            done, _ = concurrent.futures.wait(
+                self._futures.values(), return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for key in sorted(key for key, future in self._futures.items() if future in done):
+                for reply, children in self._take(key):
+                    yield self.video._comment(reply)
+
+
+    def _walk(self, key=None):
+        if key is None:
+            for page in range(self._page_number):
+                yield from self._walk((page, ))
+            return
+        for index, (reply, children) in enumerate(self._take(key)):
+            yield self.video._comment(reply)
+            for number in range(len(children)):
+                yield from self._walk(key + (index, number))
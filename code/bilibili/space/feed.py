@@ -0,0 +1,86 @@
+__all__ = ('FeedFollower', )
+
+
+
+import concurrent.futures
+import json
+import os
+import warnings
+
+from ..utils.schedule import run_every
+from .model import User
+
+
+
+class FeedFollower:
+    '''Poll the dynamics of many users, yielding only new ones
+
+    The newest dynamic id of each user is remembered, so a poll costs one
+    page per user when nothing happened. Users are polled by `workers`
+    threads sharing the pooled transport.
+
+    Argument:
+        - path: [str, None], JSON file of {mid: newest dynamic id}
+        - workers: int, number of users polled concurrently
+        - backfill: bool, on the first poll of a user, yield the whole
+            history instead of the first page only
+
+    Example:
+        >>> follower = FeedFollower('feeds.json', workers=16)
+        >>> for dynamic in follower.poll(mids):
+        ...     print(dynamic)
+        >>> follower.run(mids, interval=600, callback=print)
+    '''
+
+    def __init__(self, path=None, workers=8, backfill=False):
+        self.path = path
+        self.workers = workers
+        self.backfill = backfill
+        self.newest = dict()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.newest = {int(mid): id for mid, id in json.load(f).items()}
+
+
+    def __repr__(self):
+        return f'<FeedFollower @ {len(self.newest)} users>'
+
+
+    def poll(self, mids):
+        '''Iterate new dynamics of every user in `mids`, as users complete
+        '''
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            futures = {executor.submit(self._poll, int(mid)): mid for mid in mids}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    dynamics = future.result()
+                except Exception as e:
+                    warnings.warn(f'Failed to poll user {futures[future]}: {e}', Warning)
+                    continue
+                yield from dynamics
+        self.save()
+
+
+    def run(self, mids, interval=600, callback=print, rounds=None):
+        '''Poll every `interval` seconds and call `callback(dynamic)` for each
+        new dynamic, `rounds` times or forever
+        '''
+        run_every(lambda: self.poll(mids), interval, callback, rounds)
+
+
+    def save(self):
+        if self.path:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.newest, f)
+            os.replace(self.path + '.tmp', self.path)
+
+
+    def _poll(self, mid):
+        user = User(mid, False)
+        since = self.newest.get(mid)
+        # on first sight of a user, the first page sets the watermark
+        pages = 1 if since is None and not self.backfill else None
+        dynamics = list(user.dynamics_since(since or 0, pages))
+        if dynamics:
+            self.newest[mid] = max(since or 0, max(dynamic.id for dynamic in dynamics))
+        return dynamics
@@ -0,0 +1,205 @@
+__all__ = ('GraphCrawler', )
+
+
+
+import concurrent.futures
+import contextlib
+import heapq
+import itertools
+import os
+import sqlite3
+import warnings
+
+from .model import User
+
+
+
+class GraphCrawler:
+    '''Breadth-first crawler of the follower/following graph
+
+    Edges are appended to `edges` as "follower<TAB>following" lines instead
+    of being kept in memory. Every `checkpoint_every` users, the edge file is
+    flushed, and the users seen, expanded or failed since the last checkpoint
+    and the size of the edge file are written to the SQLite file
+    `checkpoint`, so a checkpoint costs what changed, not the whole crawl. A
+    crawler created with the same paths continues from there, and truncates
+    edges written after the checkpoint.
+
+    Argument:
+        - seeds: iterable, mids to start from
+        - edges: str, path of the edge list file
+        - checkpoint: [str, None], path of the checkpoint database
+        - direction: str, 'followers', 'followings' or 'both'
+        - max_depth: int, hops from the seeds, users that far are only
+            reached by the edges of their neighbours, they are not expanded
+        - max_nodes: [int, None], number of users to expand
+        - workers: int, number of users expanded concurrently
+        - priority: [callable(mid, depth), None], lower is expanded first,
+            default is the depth, i.e. breadth first
+        - checkpoint_every: int, number of users between two checkpoints
+
+    Example:
+        >>> crawler = GraphCrawler([546195], 'edges.tsv', 'crawl.sqlite3', max_depth=2)
+        >>> crawler.run()
+    '''
+
+    # states of a user in the checkpoint, queued ones form the frontier
+    QUEUED, EXPANDED, FAILED = 0, 1, 2
+
+    def __init__(self, seeds, edges, checkpoint=None, direction='followers',
+            max_depth=2, max_nodes=None, workers=8, priority=None,
+            checkpoint_every=100):
+        if direction not in ('followers', 'followings', 'both'):
+            raise ValueError(f'Unknown direction {direction!r}.')
+        self.edges = edges
+        self.checkpoint = checkpoint
+        self.direction = direction
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.workers = workers
+        self.priority = priority
+        self.checkpoint_every = checkpoint_every
+        self.expanded = 0
+        self.failed = list()
+        self._frontier = list()
+        self._seen = set()
+        self._counter = itertools.count()
+        self._edges_size = 0
+        self._changes = dict()  # {mid: (depth, state)} since the last checkpoint
+        if not (checkpoint and self._load()):
+            for mid in seeds:
+                self._push(int(mid), 0)
+
+
+    def __repr__(self):
+        return f'<GraphCrawler @ {self.expanded} expanded, {len(self._frontier)} queued>'
+
+
+    def run(self):
+        '''Crawl until the frontier is empty or `max_nodes` users are expanded,
+        return the number of expanded users
+        '''
+        mode = 'r+b' if os.path.exists(self.edges) else 'wb'
+        with open(self.edges, mode) as file, self._connect() as self._connection, \
+                concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            file.seek(self._edges_size)
+            file.truncate()
+            running = dict()
+            since_checkpoint = 0
+            try:
+                while True:
+                    while self._frontier and len(running) < self.workers \
+                            and not self._exhausted(running):
+                        _, _, mid, depth = heapq.heappop(self._frontier)
+                        running[executor.submit(self._expand, mid)] = (mid, depth)
+                    if not running:
+                        break
+                    done, _ = concurrent.futures.wait(
+                        running, return_when=concurrent.futures.FIRST_COMPLETED,
+                    )
+                    for future in done:
+                        mid, depth = running.pop(future)
+                        self._collect(file, future, mid, depth)
+                    since_checkpoint += len(done)
+                    if since_checkpoint >= self.checkpoint_every:
+                        self._save(file)
+                        since_checkpoint = 0
+            finally:
+                for future in running:
+                    future.cancel()
+                self._save(file)
+        return self.expanded
+
+
+    def _exhausted(self, running):
+        return self.max_nodes is not None and self.expanded + len(running) >= self.max_nodes
+
+
+    def _push(self, mid, depth):
+        if depth < self.max_depth and mid not in self._seen:
+            self._seen.add(mid)
+            priority = depth if self.priority is None else self.priority(mid, depth)
+            heapq.heappush(self._frontier, (priority, next(self._counter), mid, depth))
+            self._changes[mid] = (depth, self.QUEUED)
+
+
+    def _expand(self, mid):
+        user = User(mid, False)
+        edges = list()
+        if self.direction in ('followers', 'both'):
+            edges.extend((follower.id, mid) for follower in user.followers)
+        if self.direction in ('followings', 'both'):
+            edges.extend((mid, following.id) for following in user.followings)
+        return edges
+
+
+    def _collect(self, file, future, mid, depth):
+        try:
+            edges = future.result()
+        except Exception as e:
+            warnings.warn(f'Failed to expand user {mid}: {e}', Warning)
+            self.failed.append(mid)
+            self._changes[mid] = (depth, self.FAILED)
+            return
+        file.write(''.join(f'{a}\t{b}\n' for a, b in edges).encode())
+        self.expanded += 1
+        self._changes[mid] = (depth, self.EXPANDED)
+        for a, b in edges:
+            self._push(b if a == mid else a, depth+1)
+
+
+    def _save(self, file):
+        file.flush()
+        os.fsync(file.fileno())
+        self._edges_size = file.tell()
+        if not self.checkpoint:
+            self._changes.clear()
+            return
+        # users still running stay queued, they are expanded again after resuming
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO user VALUES (?, ?, ?) '
+                'ON CONFLICT (mid) DO UPDATE SET state = excluded.state',
+                ((mid, depth, state) for mid, (depth, state) in self._changes.items()),
+            )
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                (('expanded', self.expanded), ('edges_size', self._edges_size)),
+            )
+        self._changes.clear()
+
+
+    def _connect(self):
+        # a connection that does nothing without `checkpoint`
+        if not self.checkpoint:
+            return contextlib.nullcontext()
+        connection = sqlite3.connect(self.checkpoint)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS user (mid INTEGER PRIMARY KEY, depth INTEGER, state INTEGER)'
+        )
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)')
+        return contextlib.closing(connection)
+
+
+    def _load(self):
+        # return whether there is a checkpoint to continue from
+        with self._connect() as connection:
+            meta = dict(connection.execute('SELECT key, value FROM meta'))
+            if not meta:
+                return False
+            self.expanded = meta['expanded']
+            self._edges_size = meta['edges_size']
+            frontier = list()
+            for mid, depth, state in connection.execute('SELECT mid, depth, state FROM user'):
+                self._seen.add(mid)
+                if state == self.QUEUED:
+                    frontier.append((mid, depth))
+                elif state == self.FAILED:
+                    self.failed.append(mid)
+        for mid, depth in frontier:
+            self._seen.discard(mid)
+            self._push(mid, depth)
+        # already in the checkpoint
+        self._changes.clear()
+        return True
@@ -0,0 +1,99 @@
+__all__ = ('IdentityMap', 'get_identity_map', 'set_identity_map')
+
+
+
+import collections
+import threading
+import weakref
+
+
+
+class IdentityMap:
+    '''Map of (model, id) to the only object of that id
+
+    By default objects are held by weak references, they are forgotten once
+    nothing else refers to them; with `maxsize` the last used objects are
+    held strongly instead, so they survive between uses in a long crawl.
+
+    Argument:
+        - maxsize: [int, None], number of objects kept per model, None for
+            weak references
+
+    Example:
+        >>> set_identity_map(IdentityMap(maxsize=100000))
+        >>> User(546195) is User(546195)
+        True
+    '''
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._maps = dict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        sizes = ', '.join(f'{cls.__name__}: {len(items)}' for cls, items in self._maps.items())
+        return f'<IdentityMap({sizes})>'
+
+
+    def __len__(self):
+        return sum(map(len, self._maps.values()))
+
+
+    def get(self, cls, id):
+        '''Return the object of `cls` with `id`, None if there is not
+        '''
+        with self._lock:
+            items = self._maps.get(cls)
+            if items is None:
+                return None
+            item = items.get(id)
+            if item is not None and self.maxsize is not None:
+                items.move_to_end(id)
+            return item
+
+
+    def add(self, item):
+        '''Remember `item`, keyed by its class and `id`
+        '''
+        with self._lock:
+            items = self._maps.get(type(item))
+            if items is None:
+                items = self._maps[type(item)] = self._new_map()
+            items[item.id] = item
+            if self.maxsize is not None:
+                items.move_to_end(item.id)
+                while len(items) > self.maxsize:
+                    items.popitem(last=False)
+
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+    def _new_map(self):
+        if self.maxsize is None:
+            return weakref.WeakValueDictionary()
+        return collections.OrderedDict()
+
+
+
+_identity_map = IdentityMap()
+
+
+
+def get_identity_map():
+    '''Return the process-wide identity map, None if disabled
+    '''
+    return _identity_map
+
+
+def set_identity_map(identity_map):
+    '''Replace the process-wide identity map, None to disable it
+
+    Example:
+        >>> set_identity_map(IdentityMap(maxsize=100000))
+    '''
+    global _identity_map
+    _identity_map = identity_map
@@ -1,18 +1,24 @@
-__all__ = ('User', 'Video', 'Dynamic', 'Comment')
+__all__ = ('User', 'Video', 'Dynamic', 'Comment', 'hydrate')
 
 
 
 import collections
-import faker
+import concurrent.futures
+import itertools
 import math
-import requests
 import time
 import warnings
 
+from .crawler import CommentCrawler
+from .identity import get_identity_map
+from ..utils.prefetch import prefetch
+from ..utils.transport import get_transport
 
 
-F = faker.Faker()
-Comment = collections.namedtuple('Comments', ('content', 'like', 'user_id', 'timestamp'))
+
+Comment = collections.namedtuple(
+    'Comments', ('content', 'like', 'user_id', 'timestamp', 'rpid'), defaults=(None, ),
+)
 
 
 
@@ -27,10 +33,13 @@ class User:
             - number_of_followers: int
             - followings: iterator
             - number_of_followings: int
-            + dynamics: itertor, to be done
+            - dynamics: iterator
+            - info: dict, fetched on first access
+            - partial: bool, whether `info` comes from a list entry only
             + channels: NotImplementedError
             + favorites: NotImplementedError
         - function
+            - dynamics_since(dynamic_id: int, pages: int) -> iterator
             - set_info()
             - set_cookies(cookies: dict)
             - set_cookies_from_selenium(webdriver: selenium.webdriver.Remote)
@@ -40,25 +49,57 @@ class User:
     _URL_FOLLOWER = 'https://api.bilibili.com/x/relation/followers'
     _URL_FOLLOWING = 'https://api.bilibili.com/x/relation/followings'
 
+    window = 4  # number of pages requested ahead when iterating
+
+    def __new__(cls, id, info=True):
+        return _identical(cls, id) or super().__new__(cls)
+
+
     def __init__(self, id, info=True):
-        self.id = int(id)
-        self._session = requests.Session()
-        self._session.headers.update({
-            'host': 'api.bilibili.com',
-            'referer': 'https://www.bilibili.com',
-            'user-agent': F.user_agent(),
-        })
-        self.info = None
+        if not hasattr(self, 'id'):
+            self.id = int(id)
+            self._cookies = dict()
+            self._info = None
+            self._partial = False
+            _remember(self)
         info and self.set_info()
 
 
     def __repr__(self):
-        if self.info:
-            return f'<User("{self.info["name"]}") @ LV {self.info["level"]}>'
+        if self._info:
+            return f'<User("{self._info["name"]}") @ LV {self._info.get("level")}>'
         else:
             return f'<User({self.id})>'
 
 
+    @classmethod
+    def from_entry(cls, entry):
+        '''Build from an entry of the follower or following list, without
+        requesting anything; `info` only holds name, face and sign until
+        `set_info()` is called
+        '''
+        self = cls(entry['mid'], False)
+        if not self._info:
+            self._info = cls._entry_info(entry)
+            self._partial = True
+        return self
+
+
+    @property
+    def info(self):
+        '''Information of current user, requested on first access
+        '''
+        self._info or self.set_info()
+        return self._info
+
+
+    @property
+    def partial(self):
+        '''Whether `info` only holds the fields given by a list entry
+        '''
+        return self._partial
+
+
     @property
     def videos(self):
         '''Iterate all videos from user
@@ -68,11 +109,10 @@ class User:
             ...     print(video)
         '''
         url = self._URL_VIDEO
-        count = self.number_of_videos
-        keys1, key2 = ('data', 'list', 'vlist'), 'aid'
-        for page in self._data(url, count, 30, 'pubdate', 'mid', keys1, key2):
-            for id in page:
-                yield Video(id)
+        keys, count_keys = ('data', 'list', 'vlist'), ('data', 'page', 'count')
+        for page in self._data(url, count_keys, 30, 'pubdate', 'mid', keys):
+            for entry in page:
+                yield Video.from_entry(entry)
 
 
     @property
@@ -92,11 +132,10 @@ class User:
             ...     print(follower)
         '''
         url = self._URL_FOLLOWER
-        count = self.number_of_followers
-        keys1, key2 = ('data', 'list'), 'mid'
-        for page in self._data(url, count, 20, 'desc', 'vmid', keys1, key2):
-            for id in page:
-                yield User(id, self.info is not None)
+        keys, count_keys = ('data', 'list'), ('data', 'total')
+        for page in self._data(url, count_keys, 20, 'desc', 'vmid', keys):
+            for entry in page:
+                yield User.from_entry(entry)
 
 
     @property
@@ -116,11 +155,10 @@ class User:
             ...     print(following)
         '''
         url = self._URL_FOLLOWING
-        keys1, key2 = ('data', 'list'), 'mid'
-        count = self.number_of_followings
-        for page in self._data(url, count, 20, 'desc', 'vmid', keys1, key2):
-            for id in page:
-                yield User(id, self.info is not None)
+        keys, count_keys = ('data', 'list'), ('data', 'total')
+        for page in self._data(url, count_keys, 20, 'desc', 'vmid', keys):
+            for entry in page:
+                yield User.from_entry(entry)
 
 
     @property
@@ -137,12 +175,19 @@ class User:
         '''
         # warnings.warn('Dynamics have complex types, to be done.', Warning)
         for dynamic in self._dynamics():
-            desc = dynamic.pop('desc')
-            yield Dynamic.from_args(
-                id=desc['dynamic_id'], user_id=desc['uid'], view=desc['view'],
-                repost=desc['repost'], number_of_comments=desc['comment'],
-                like=desc['like'], timestamp=desc['timestamp'], others=desc,
-            )
+            yield Dynamic.from_desc(dynamic.pop('desc'))
+
+
+    def dynamics_since(self, dynamic_id, pages=None):
+        '''Iterate dynamics newer than `dynamic_id`, newest first, paging
+        stops at the first one already seen or after `pages` pages
+
+        Example:
+            >>> for dynamic in user.dynamics_since(newest_seen_id):
+            ...     print(dynamic)
+        '''
+        for dynamic in self._dynamics(dynamic_id, pages):
+            yield Dynamic.from_desc(dynamic.pop('desc'))
 
 
     @property
@@ -158,14 +203,15 @@ class User:
     def set_info(self):
         '''Set information of current user
         '''
-        if not self.info:
-            self.info = self._find_info()
+        if not self._info or self._partial:
+            self._info = dict(self._info or (), **self._find_info())
+            self._partial = False
 
 
     def set_cookies(self, cookies):
-        '''Set cookies of current session with `cookies`
+        '''Set cookies sent by requests of current user with `cookies`
         '''
-        self._session.cookies.update(cookies)
+        self._cookies.update(cookies)
 
 
     def set_cookies_from_selenium(self, webdriver):
@@ -175,41 +221,51 @@ class User:
         self.set_cookies({item['name']: item['value'] for item in cookies})
 
 
-    def _data(self, url, count, ps, order, id_name, keys1, key2):
-        page_number = math.ceil(count/ps)
-        f, g = self._ids_at, self._data_at
-        return (
-            f(g(url, page+1, ps, order, id_name), keys1, key2)
-                for page in range(page_number)
+    def _data(self, url, count_keys, ps, order, id_name, keys):
+        # the first page gives the count, the others are prefetched in order
+        first_page = self._data_at(url, 1, ps, order, id_name)
+        count = first_page
+        for key in count_keys:
+            count = count[key]
+        yield self._entries_at(first_page, keys)
+        pages = prefetch(
+            lambda page: self._data_at(url, page, ps, order, id_name),
+            range(2, math.ceil(count/ps)+1), self.window,
         )
+        for page in pages:
+            yield self._entries_at(page, keys)
 
 
     def _data_at(self, url, page, ps, order, id_name):
         params = dict(ps=ps, pn=page, order=order)
         params[id_name] = self.id
-        response = self._session.get(url, params=params)
-        return response.json()
+        return self._get_json(url, params)
 
 
-    def _ids_at(self, data, keys1, key2):
+    @staticmethod
+    def _entries_at(data, keys):
         try:
-            for key in keys1:
+            for key in keys:
                 data = data[key]
-            for video in data:
-                yield video[key2]
+            yield from data
         except KeyError:
             warnings.warn('Unauthenticated access cannot get more information, ' \
                 'please login by selenium.', Warning)
             return None
 
 
-    def _dynamics(self):
+    def _dynamics(self, since=0, pages=None):
         url = 'https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/space_history'
         params = dict(host_uid=self.id, offset_dynamic_id=0)
-        while True:
-            response = requests.get(url, params=params)  # do not use `self._session`
-            data = response.json()['data']
-            yield from data['cards']
+        for _ in itertools.count() if pages is None else range(pages):
+            data = self._get_json(url, params)['data']
+            for card in data.get('cards') or ():
+                if card['desc']['dynamic_id'] <= since:
+                    # a pinned dynamic can be older than the new ones below it
+                    if (card.get('extra') or dict()).get('is_space_top'):
+                        continue
+                    return
+                yield card
             if not data['has_more']:
                 break
             params['offset_dynamic_id'] = data['next_offset']
@@ -217,31 +273,51 @@ class User:
 
     def _find_info(self):
         info = dict()
-        # account info
-        params = dict(mid=self.id, jsonp='jsonp')
-        url = 'https://api.bilibili.com/x/space/acc/info'
-        response = self._session.get(url, params=params)
-        data = response.json().get('data')
-        for key in ('name', 'sex', 'face', 'sign', 'level', 'birthday'):
-            info[key] = data.get(key)
-        # up status
-        url = 'https://api.bilibili.com/x/space/upstat'
-        response = self._session.get(url, params=params)
-        data = response.json().get('data')
-        info['archive_view'] = data.get('archive').get('view')
-        info['article_view'] = data.get('article').get('view')
-        info['likes'] = data.get('likes')
-        # relation status
-        params = dict(vmid=self.id, jsonp='jsonp')
-        url = 'https://api.bilibili.com/x/relation/stat'
-        response = self._session.get(url, params=params)
-        data = response.json().get('data')
-        info['following'] = data.get('following')
-        info['follower'] = data.get('follower')
-        # return value
+        for url, params, parse in self._info_requests(self.id):
+            info.update(parse(self._get_json(url, params).get('data')))
         return info
 
 
+    @staticmethod
+    def _info_requests(id):
+        params1 = dict(mid=id, jsonp='jsonp')
+        params2 = dict(vmid=id, jsonp='jsonp')
+        return (
+            ('https://api.bilibili.com/x/space/acc/info', params1, User._account_info),
+            ('https://api.bilibili.com/x/space/upstat', params1, User._upstat_info),
+            ('https://api.bilibili.com/x/relation/stat', params2, User._relation_info),
+        )
+
+
+    @staticmethod
+    def _entry_info(entry):
+        return dict(name=entry.get('uname'), face=entry.get('face'), sign=entry.get('sign'))
+
+
+    @staticmethod
+    def _account_info(data):
+        keys = ('name', 'sex', 'face', 'sign', 'level', 'birthday')
+        return {key: data.get(key) for key in keys}
+
+
+    @staticmethod
+    def _upstat_info(data):
+        return dict(
+            archive_view=data.get('archive').get('view'),
+            article_view=data.get('article').get('view'),
+            likes=data.get('likes'),
+        )
+
+
+    @staticmethod
+    def _relation_info(data):
+        return dict(following=data.get('following'), follower=data.get('follower'))
+
+
+    def _get_json(self, url, params):
+        return get_transport().get_json(url, params=params, cookies=self._cookies)
+
+
 
 class Video:
     '''Video model
@@ -249,55 +325,90 @@ class Video:
     API:
         - property
             - comments, iterator
+            - info: dict, fetched on first access
+            - partial: bool, whether `info` comes from a list entry only
         - function
+            - crawl_comments(workers: int, ordered: bool, progress: callable, window: int)
             - set_info()
     '''
 
+    workers = 8  # number of concurrent requests when crawling comments
+
+    def __new__(cls, id, info=True):
+        return _identical(cls, id) or super().__new__(cls)
+
+
     def __init__(self, id, info=True):
-        self.id = int(id)
-        self._session = requests.Session()
-        self._session.headers.update({
-            'host': 'api.bilibili.com',
-            'referer': 'https://www.bilibili.com',
-            'user-agent': F.user_agent(),
-        })
-        self._timestamp = int(1000*time.time())
-        self.info = None
+        if not hasattr(self, 'id'):
+            self.id = int(id)
+            self._timestamp = int(1000*time.time())
+            self._info = None
+            self._partial = False
+            _remember(self)
         info and self.set_info()
 
 
     def __repr__(self):
-        if self.info:
-            return f'<Video({self.info["title"]}) @ {self.info["view"]}>'
+        if self._info:
+            return f'<Video({self._info["title"]}) @ {self._info["view"]}>'
         else:
             return f'<Video({self.id})>'
 
 
+    @classmethod
+    def from_entry(cls, entry):
+        '''Build from an entry of `arc/search`, without requesting anything;
+        `info` lacks favorite, coin, share and like until `set_info()` is called
+        '''
+        self = cls(entry['aid'], False)
+        if not self._info:
+            self._info = cls._entry_info(entry)
+            self._partial = True
+        return self
+
+
     @property
-    def comments(self):
+    def info(self):
+        '''Information of current video, requested on first access
+        '''
+        self._info or self.set_info()
+        return self._info
+
+
+    @property
+    def partial(self):
+        '''Whether `info` only holds the fields given by a list entry
         '''
+        return self._partial
+
+
+    @property
+    def comments(self):
+        '''Iterate all comments, pages are requested by `workers` threads at
+        most `2*workers` pages ahead of the comment taken
+
         Example:
             >>> for comment in video.comments:
             ...     print(comment)
         '''
-        for page in self._comments(): 
-            yield from page
+        return iter(self.crawl_comments(ordered=True))
 
 
-    def set_info(self):
-        if not self.info:
-            self.info = self._find_info()
+    def crawl_comments(self, workers=None, ordered=False, progress=None, window=None):
+        '''Return a `CommentCrawler` streaming comments as pages arrive
+
+        Example:
+            >>> for comment in video.crawl_comments(16, progress=print):
+            ...     print(comment)
+        '''
+        workers = workers or self.workers
+        return CommentCrawler(self, workers, ordered, progress, window=window)
 
 
-    def _comments(self, type=1):
-        first_page = self._comments_data_at(1, type=type)
-        if first_page['data']:
-            page_info = first_page['data']['page']
-            page_number = math.ceil(page_info['count']/page_info['size'])
-            f, g = self._find_comments, self._comments_data_at
-            return (f(g(page+1, type=type)['data']['replies'])
-                for page in range(page_number))
-        return list(list())
+    def set_info(self):
+        if not self._info or self._partial:
+            self._info = self._find_info()
+            self._partial = False
 
 
     def _comments_data_at(self, page, root=0, ps=10, sort=2, type=1):
@@ -306,32 +417,36 @@ class Video:
         if root:
             url += '/reply'
             params.update(dict(root=root, ps=ps))
-        return self._session.get(url, params=params).json()
-
-
-    def _find_comments(self, replies, ps=10):
-        if replies:
-            for reply in replies:
-                message = reply['content']['message']
-                mid = int(reply['member']['mid'])
-                ctime = reply['ctime']
-                like = reply['like']
-                yield Comment(message, like, mid, ctime)
-                rcount = reply['rcount']
-                if rcount:
-                    for page in range(math.ceil(rcount/ps)):
-                        rpid = reply['rpid']
-                        data = self._comments_data_at(page+1, rpid, ps)
-                        replies = data['data']['replies']
-                        yield from self._find_comments(replies)
+        return get_transport().get_json(url, params=params)
+
+
+    @staticmethod
+    def _comment(reply):
+        message = reply['content']['message']
+        mid = int(reply['member']['mid'])
+        return Comment(message, reply['like'], mid, reply['ctime'], reply['rpid'])
 
 
     def _find_info(self):
+        url = 'https://api.bilibili.com/x/web-interface/view'
+        data = get_transport().get_json(url, params=dict(aid=self.id)).get('data')
+        return self._view_info(data)
+
+
+    @staticmethod
+    def _entry_info(entry):
+        return dict(
+            pic=entry.get('pic'), title=entry.get('title'), pubdate=entry.get('created'),
+            desc=entry.get('description'), duration=_seconds(entry.get('length')),
+            owner=entry.get('mid'), view=entry.get('play'),
+            danmaku=entry.get('video_review'), reply=entry.get('comment'),
+        )
+
+
+    @staticmethod
+    def _view_info(data):
         info = dict()
         # video info
-        url = 'https://api.bilibili.com/x/web-interface/view'
-        response = self._session.get(url, params=dict(aid=self.id))
-        data = response.json().get('data')
         for key in ('pic', 'title', 'pubdate', 'desc', 'duration'):
             info[key] = data.get(key)
         info['owner'] = data['owner']['mid']
@@ -350,20 +465,45 @@ class Dynamic:
         - property
             - comments, iterator
             - number_of_comments, int
+            - view, repost, like, timestamp: int, fetched on first access
         - function
             - set_info()
     '''
 
+    # millions of dynamics are created by feed polling, keep them small
+    __slots__ = (
+        'id', 'user_id', 'view', 'repost', 'number_of_comments', 'like',
+        'timestamp', 'others', '__weakref__',
+    )
+    _DETAILS = ('view', 'repost', 'like', 'timestamp', 'number_of_comments')
+
+    def __new__(cls, id, info=True):
+        return _identical(cls, id) or super().__new__(cls)
+
+
     def __init__(self, id, info=True):
-        self.id = int(id)
+        if not hasattr(self, 'id'):
+            self.id = int(id)
+            _remember(self)
         info and self.set_info()
 
 
     def __repr__(self):
-        view = getattr(self, 'view', 'None')
+        try:
+            view = object.__getattribute__(self, 'view')
+        except AttributeError:
+            view = 'None'
         return f'<Dynamic({self.id} @ View {view})>'
 
 
+    def __getattr__(self, name):
+        # only called for missing attributes, details are loaded lazily
+        if name in self._DETAILS:
+            self.set_info()
+            return object.__getattribute__(self, name)
+        raise AttributeError(f'{type(self).__name__!r} object has no attribute {name!r}')
+
+
     @classmethod
     def from_args(cls, id, **kwargs):
         self = cls(id, False)
@@ -374,6 +514,13 @@ class Dynamic:
         return self
 
 
+    @classmethod
+    def from_desc(cls, desc):
+        '''Build from the `desc` field of a card of `space_history`
+        '''
+        return cls.from_args(desc['dynamic_id'], **cls._desc_info(desc))
+
+
     @property
     def comments(self):
         pass
@@ -382,11 +529,64 @@ class Dynamic:
     def set_info(self):
         url = 'https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/get_dynamic_detail'
         params = dict(dynamic_id=self.id)
-        data = requests.get(url, params=params).json()['data']['card']['desc']
+        data = get_transport().get_json(url, params=params)['data']['card']['desc']
+        for key, value in self._detail_info(data).items():
+            setattr(self, key, value)
+
+
+    @staticmethod
+    def _desc_info(desc):
+        return dict(
+            user_id=desc['uid'], view=desc['view'], repost=desc['repost'],
+            number_of_comments=desc['comment'], like=desc['like'],
+            timestamp=desc['timestamp'], others=desc,
+        )
+
+
+    @staticmethod
+    def _detail_info(data):
         keys = ('view', 'repost', 'like', 'timestamp')
-        for key in keys:
-            setattr(self, key, data.get(key, None))
-        self.number_of_comments = data['comment']
+        info = {key: data.get(key, None) for key in keys}
+        info['number_of_comments'] = data['comment']
+        return info
+
+
+
+def _identical(cls, id):
+    # the object already materialized for `id`, if any
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        return identity_map.get(cls, int(id))
+
+
+def _remember(item):
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.add(item)
+
+
+def _seconds(length):
+    # '1:02:03' or '02:03' -> 3723 or 123
+    if not length:
+        return None
+    seconds = 0
+    for part in str(length).split(':'):
+        seconds = 60*seconds + int(part or 0)
+    return seconds
+
+
+def hydrate(objects, workers=8):
+    '''Set information of many `User`, `Video` or `Dynamic` objects with at
+    most `workers` of them requesting at the same time
+
+    Example:
+        >>> followers = hydrate(itertools.islice(user.followers, 100))
+    '''
+    objects = list(objects)
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        for _ in executor.map(lambda item: item.set_info(), objects):
+            pass
+    return objects
 
 
 
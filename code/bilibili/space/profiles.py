@@ -0,0 +1,148 @@
+__all__ = ('ProfileLoader', )
+
+
+
+import concurrent.futures
+import itertools
+
+from .model import User
+from ..utils.transport import get_transport
+
+
+
+class ProfileLoader:
+    '''Load the profiles of many users, the requests of every user sharing
+    one thread pool
+
+    `User.set_info()` sends its three requests one after the other; here
+    they are all in flight together, for `window` users at a time. With
+    `cards`, the account requests are replaced by one request of the card
+    endpoint per `batch_size` users.
+
+    Users are yielded as their profile completes, already complete ones
+    right away. A user with some failed requests is yielded with `partial`
+    info, one with every request failed is not yielded; both are reported
+    in `failures`.
+
+    Argument:
+        - workers: int, number of requests in flight
+        - cards: bool, load accounts with the multi-user card endpoint
+        - batch_size: int, users per card request
+        - window: [int, None], users loading at the same time, 4 per worker
+            by default
+
+    API:
+        - property
+            - failures: dict, {mid: [(url, error), ...]} of the last `load`
+        - function
+            - load(mids: iterable) -> iterator of User
+
+    Example:
+        >>> loader = ProfileLoader(workers=32, cards=True)
+        >>> for user in loader.load(follower.id for follower in user.followers):
+        ...     print(user.info['follower'])
+        >>> loader.failures
+        {546195: [('https://api.bilibili.com/x/relation/stat', HTTPError(...))]}
+    '''
+
+    _URL_ACCOUNT = 'https://api.bilibili.com/x/space/acc/info'
+    _URL_CARDS = 'https://api.vc.bilibili.com/account/v1/user/cards'
+
+    def __init__(self, workers=16, cards=False, batch_size=50, window=None):
+        self.workers = workers
+        self.cards = cards
+        self.batch_size = batch_size
+        self.window = window or 4*workers
+        self.failures = dict()
+
+
+    def __repr__(self):
+        return f'<ProfileLoader @ {self.workers} workers>'
+
+
+    def load(self, mids):
+        '''Iterate `User` objects of `mids` with their info set, as loaded
+        '''
+        self.failures = dict()
+        loading, futures = dict(), dict()
+        mids = iter(mids)
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            try:
+                while True:
+                    batch = [User(mid, False) for mid in itertools.islice(mids, self.batch_size)]
+                    if not batch:
+                        break
+                    yield from self._submit(executor, batch, loading, futures)
+                    while len(loading) >= self.window:
+                        yield from self._complete(loading, futures)
+                while futures:
+                    yield from self._complete(loading, futures)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+    def _submit(self, executor, users, loading, futures):
+        ids = list()
+        for user in users:
+            if user._info and not user._partial:
+                yield user
+            elif user.id not in loading:
+                # user, number of requests left, info, errors
+                loading[user.id] = [user, 0, dict(), list()]
+                ids.append(user.id)
+        if not ids:
+            return
+        if self.cards:
+            futures[executor.submit(self._cards, ids)] = (ids, self._URL_CARDS, None)
+            for id in ids:
+                loading[id][1] += 1
+        for id in ids:
+            user = loading[id][0]
+            for url, params, parse in User._info_requests(id):
+                if not (self.cards and url == self._URL_ACCOUNT):
+                    futures[executor.submit(user._get_json, url, params)] = ((id, ), url, parse)
+                    loading[id][1] += 1
+
+
+    def _complete(self, loading, futures):
+        done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            ids, url, parse = futures.pop(future)
+            try:
+                results = future.result()
+                if parse is not None:
+                    results = {ids[0]: parse(results.get('data'))}
+            except Exception as e:
+                results, error = dict(), e
+            else:
+                error = KeyError('missing from the response')
+            for id in ids:
+                state = loading[id]
+                if id in results:
+                    state[2].update(results[id])
+                else:
+                    state[3].append((url, error))
+                state[1] -= 1
+                if not state[1]:
+                    del loading[id]
+                    user = self._finish(*state)
+                    if user is not None:
+                        yield user
+
+
+    def _finish(self, user, left, info, errors):
+        if errors:
+            self.failures[user.id] = errors
+        if not info:
+            return None
+        # fields of a list entry stay when the account request failed
+        user._info = dict(user._info or (), **info)
+        user._partial = bool(errors)
+        return user
+
+
+    def _cards(self, ids):
+        params = dict(uids=','.join(map(str, ids)))
+        data = get_transport().get_json(self._URL_CARDS, params=params)
+        return {int(card['mid']): User._account_info(card) for card in data['data'] or ()}
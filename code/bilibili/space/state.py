@@ -0,0 +1,203 @@
+__all__ = ('StateStore', )
+
+
+
+import json
+import sqlite3
+import threading
+import time
+
+from .model import User, Video, Dynamic, Comment
+from ..utils.export import to_record
+
+
+
+class StateStore:
+    '''Crawl state in a SQLite file: every user, video, comment and dynamic
+    seen, keyed by mid, aid, rpid and dynamic_id, with the time it was last
+    fetched
+
+    Items are buffered and upserted `batch_size` rows per transaction. A
+    partial item, e.g. a user of a follower list, is recorded as seen but
+    neither replaces the data of a fetched one nor counts as fetched, so it
+    is the first to come out of `stale()`.
+
+    Argument:
+        - path: str, database file
+        - batch_size: int, number of rows per transaction
+
+    API:
+        - function
+            - add(item, fetched: float)
+            - extend(items, fetched: float) -> int
+            - upsert(kind: str, id: int, record: dict, partial: bool, fetched: float)
+            - flush()
+            - get(kind: str, id: int) -> dict
+            - stale(kind: str, age: float, limit: int) -> list of int
+            - count(kind: str) -> int
+            - close()
+
+    Example:
+        >>> with StateStore('state.sqlite3') as state:
+        ...     state.extend(user.followers)
+        ...     for mid in state.stale('user', age=86400, limit=1000):
+        ...         state.add(User(mid))
+    '''
+
+    KINDS = dict(user='mid', video='aid', comment='rpid', dynamic='dynamic_id')
+
+    def __init__(self, path='bilibili-state.sqlite3', batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = {kind: dict() for kind in self.KINDS}
+        self._size = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # durable at checkpoints, enough for a state that can be crawled again
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        for kind, key in self.KINDS.items():
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {kind} ('
+                f'{key} INTEGER PRIMARY KEY, data TEXT, partial INTEGER, '
+                'seen REAL, last_fetched REAL)'
+            )
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {kind}_last_fetched ON {kind} (last_fetched)'
+            )
+
+
+    def __repr__(self):
+        return f'<StateStore("{self.path}")>'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def add(self, item, fetched=None):
+        '''Buffer a `User`, `Video`, `Dynamic` or `Comment`; `fetched` is the
+        time it was fetched, now by default
+        '''
+        kind, id = self._key(item)
+        self.upsert(kind, id, to_record(item), self._partial(item), fetched)
+
+
+    def extend(self, items, fetched=None):
+        '''Buffer every item, e.g. directly from `user.followers`, return the
+        number of items
+        '''
+        number = 0
+        for item in items:
+            self.add(item, fetched)
+            number += 1
+        return number
+
+
+    def upsert(self, kind, id, record, partial=False, fetched=None):
+        '''Buffer the record of an entity of `kind` in `KINDS`
+        '''
+        id, now = int(id), time.time()
+        row = (id, json.dumps(record, ensure_ascii=False), int(partial), now, None if partial else fetched or now)
+        with self._lock:
+            pending = self._pending[kind]
+            # a partial row does not replace a full one of the same batch
+            if not (partial and id in pending and not pending[id][2]):
+                self._size += id not in pending
+                pending[id] = row
+            if self._size >= self.batch_size:
+                self._flush()
+
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+
+    def get(self, kind, id):
+        '''Return the record of an entity with "partial", "seen" and
+        "last_fetched", None when never seen
+        '''
+        self.flush()
+        with self._lock:
+            row = self._connection.execute(
+                f'SELECT data, partial, seen, last_fetched FROM {kind} WHERE {self.KINDS[kind]} = ?',
+                (int(id), ),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row[0]), partial=bool(row[1]), seen=row[2], last_fetched=row[3])
+
+
+    def stale(self, kind, age=86400, limit=None):
+        '''Return ids of entities never fetched or fetched more than `age`
+        seconds ago, never fetched first, then oldest first
+        '''
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT {self.KINDS[kind]} FROM {kind} '
+                'WHERE last_fetched IS NULL OR last_fetched < ? '
+                'ORDER BY last_fetched IS NOT NULL, last_fetched LIMIT ?',
+                (time.time() - age, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+    def count(self, kind):
+        self.flush()
+        with self._lock:
+            return self._connection.execute(f'SELECT COUNT(*) FROM {kind}').fetchone()[0]
+
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._connection.close()
+
+
+    def _flush(self):
+        if not self._size:
+            return
+        with self._connection:
+            for kind, pending in self._pending.items():
+                if pending:
+                    self._connection.executemany(self._upsert_sql(kind), pending.values())
+                    pending.clear()
+        self._size = 0
+
+
+    def _upsert_sql(self, kind):
+        # a partial row only refreshes `seen` of an existing one
+        return (
+            f'INSERT INTO {kind} VALUES (?, ?, ?, ?, ?) '
+            f'ON CONFLICT ({self.KINDS[kind]}) DO UPDATE SET '
+            'data = CASE WHEN excluded.partial AND NOT partial THEN data ELSE excluded.data END, '
+            'partial = partial AND excluded.partial, '
+            'seen = excluded.seen, '
+            'last_fetched = COALESCE(excluded.last_fetched, last_fetched)'
+        )
+
+
+    @staticmethod
+    def _key(item):
+        if isinstance(item, User):
+            return 'user', item.id
+        if isinstance(item, Video):
+            return 'video', item.id
+        if isinstance(item, Dynamic):
+            return 'dynamic', item.id
+        if isinstance(item, Comment) and item.rpid is not None:
+            return 'comment', item.rpid
+        raise TypeError(f'Cannot store {item!r}.')
+
+
+    @staticmethod
+    def _partial(item):
+        if isinstance(item, (User, Video)):
+            return not item._info or item._partial
+        return False
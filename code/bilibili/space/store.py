@@ -0,0 +1,330 @@
+__all__ = ('StringPool', 'TextColumn', 'Table', 'UserTable', 'VideoTable', 'CommentTable')
+
+
+
+import array
+import bisect
+import collections
+import heapq
+import itertools
+import sys
+
+
+
+class StringPool:
+    '''Interned strings, each distinct string is stored once and referred to
+    by an int code
+
+    Example:
+        >>> pool = StringPool()
+        >>> pool.code('bilibili'), pool.code('bilibili'), pool[0]
+        (0, 0, 'bilibili')
+    '''
+
+    def __init__(self):
+        self._strings = list()
+        self._codes = dict()
+
+
+    def __repr__(self):
+        return f'<StringPool @ {len(self._strings)} strings>'
+
+
+    def __len__(self):
+        return len(self._strings)
+
+
+    def __getitem__(self, code):
+        return self._strings[code]
+
+
+    @property
+    def nbytes(self):
+        '''Bytes used by the strings and the code lookup
+        '''
+        strings = sum(map(sys.getsizeof, self._strings))
+        return strings + sys.getsizeof(self._strings) + sys.getsizeof(self._codes)
+
+
+    def code(self, string):
+        code = self._codes.get(string)
+        if code is None:
+            code = self._codes[string] = len(self._strings)
+            self._strings.append(string)
+        return code
+
+
+
+class TextColumn:
+    '''Column of free text, e.g. comments, where interning saves nothing:
+    the strings are stored end to end as UTF-8 in one `bytearray`, with the
+    offset of the end of each one
+
+    Example:
+        >>> column = TextColumn()
+        >>> column.append('哈哈哈')
+        >>> column.append('bilibili')
+        >>> column[0], column.nbytes
+        ('哈哈哈', 33)
+    '''
+
+    def __init__(self):
+        self._bytes = bytearray()
+        self._ends = array.array('Q')
+
+
+    def __repr__(self):
+        return f'<TextColumn @ {len(self)} strings>'
+
+
+    def __len__(self):
+        return len(self._ends)
+
+
+    def __getitem__(self, index):
+        index = range(len(self._ends))[index]
+        start = self._ends[index-1] if index else 0
+        return self._bytes[start:self._ends[index]].decode('utf-8')
+
+
+    def __iter__(self):
+        start = 0
+        for end in self._ends:
+            yield self._bytes[start:end].decode('utf-8')
+            start = end
+
+
+    @property
+    def nbytes(self):
+        return len(self._bytes) + self._ends.itemsize*len(self._ends)
+
+
+    def append(self, string):
+        self._bytes += string.encode('utf-8')
+        self._ends.append(len(self._bytes))
+
+
+    def tolist(self):
+        return list(self)
+
+
+
+class Table:
+    '''Columnar table, every column is an `array.array` of int64 or float64,
+    string columns hold uint32 codes of a shared `StringPool` and text
+    columns are `TextColumn`s
+
+    Subclasses set `columns` as ((name, kind), ...) with kind in 'int',
+    'float', 'str' for strings repeated across rows, e.g. sex, and 'text'
+    for ones that are not, e.g. titles, and `_row(item)` to turn an item into
+    a tuple; missing or malformed numbers, e.g. a play count of '--', are
+    stored as -1.
+
+    API:
+        - function
+            - append(item)
+            - extend(items)
+            - column(name) -> array.array
+            - values(name) -> list
+            - rows() -> iterator of namedtuple
+            - where(name, function) -> list of row indices
+            - take(indices) -> list of namedtuple
+            - top(name, n) -> list of namedtuple
+            - group_sum(key, name) -> dict
+            - group_count(key) -> dict
+            - histogram(name, bins) -> list of int
+    '''
+
+    columns = ()
+    _TYPECODES = dict(int='q', float='d', str='I')
+
+    def __init__(self, pool=None):
+        self.pool = StringPool() if pool is None else pool
+        self._kinds = dict(self.columns)
+        self._data = {
+            name: TextColumn() if kind == 'text' else array.array(self._TYPECODES[kind])
+                for name, kind in self.columns
+        }
+        self._record = collections.namedtuple(type(self).__name__ + 'Row', self._kinds)
+
+
+    def __repr__(self):
+        return f'<{type(self).__name__} @ {len(self)} rows>'
+
+
+    def __len__(self):
+        return len(self._data[self.columns[0][0]])
+
+
+    @property
+    def nbytes(self):
+        '''Bytes used by the columns and their strings, the whole string pool
+        included if a column uses it
+        '''
+        size = sum(
+            column.nbytes if isinstance(column, TextColumn) else column.itemsize*len(column)
+                for column in self._data.values()
+        )
+        if 'str' in self._kinds.values():
+            size += self.pool.nbytes
+        return size
+
+
+    def append(self, item):
+        row = self._row(item)
+        if len(row) != len(self.columns):
+            raise ValueError(f'{type(self).__name__} has {len(self.columns)} columns, got {len(row)} values.')
+        for (name, kind), value in zip(self.columns, row):
+            if kind == 'str':
+                value = self.pool.code(value or '')
+            elif kind == 'text':
+                value = value or ''
+            else:
+                value = _number(value, kind)
+            self._data[name].append(value)
+
+
+    def extend(self, items):
+        '''Append every item, e.g. directly from `user.videos`
+
+        Example:
+            >>> table = VideoTable()
+            >>> table.extend(user.videos)
+        '''
+        for item in items:
+            self.append(item)
+        return self
+
+
+    def column(self, name):
+        '''Raw column, codes for strings, a `TextColumn` for text
+        '''
+        return self._data[name]
+
+
+    def values(self, name):
+        if self._kinds[name] == 'str':
+            pool = self.pool
+            return [pool[code] for code in self._data[name]]
+        return self._data[name].tolist()
+
+
+    def rows(self):
+        return map(self._record._make, zip(*(self.values(name) for name in self._kinds)))
+
+
+    def where(self, name, function):
+        '''Indices of rows whose column `name` satisfies `function`
+
+        Example:
+            >>> table.where('like', lambda like: like > 100)
+        '''
+        return list(itertools.compress(itertools.count(), map(function, self.values(name))))
+
+
+    def take(self, indices):
+        return [self._get(index) for index in indices]
+
+
+    def top(self, name, n=10):
+        '''Rows with the `n` largest values of column `name`
+        '''
+        column = self._data[name]
+        indices = heapq.nlargest(n, range(len(column)), key=column.__getitem__)
+        return self.take(indices)
+
+
+    def group_sum(self, key, name):
+        '''Sum of column `name` grouped by column `key`
+
+        Example:
+            >>> comments.group_sum('user_id', 'like')
+        '''
+        sums = collections.defaultdict(int)
+        for group, value in zip(self.values(key), self._data[name]):
+            sums[group] += value
+        return dict(sums)
+
+
+    def group_count(self, key):
+        return dict(collections.Counter(self.values(key)))
+
+
+    def histogram(self, name, bins):
+        '''Counts of column `name` in each interval of the sorted `bins`, the
+        first count is below `bins[0]`
+
+        Example:
+            >>> videos.histogram('view', [1e3, 1e4, 1e5, 1e6])
+        '''
+        counts = [0] * (len(bins)+1)
+        for value in self._data[name]:
+            counts[bisect.bisect_right(bins, value)] += 1
+        return counts
+
+
+    def _get(self, index):
+        values = list()
+        for name, kind in self.columns:
+            value = self._data[name][index]
+            values.append(self.pool[value] if kind == 'str' else value)
+        return self._record._make(values)
+
+
+    def _row(self, item):
+        raise NotImplementedError
+
+
+
+class UserTable(Table):
+    '''Users, `info` is read as it is, nothing is requested
+    '''
+
+    columns = (
+        ('id', 'int'), ('name', 'text'), ('sex', 'str'), ('level', 'int'),
+        ('following', 'int'), ('follower', 'int'), ('likes', 'int'),
+        ('archive_view', 'int'),
+    )
+
+    def _row(self, user):
+        info = user._info or dict()
+        return (user.id, ) + tuple(info.get(name) for name, _ in self.columns[1:])
+
+
+
+class VideoTable(Table):
+    '''Videos, `info` is read as it is, nothing is requested
+    '''
+
+    columns = (
+        ('id', 'int'), ('owner', 'int'), ('title', 'text'), ('pubdate', 'int'),
+        ('duration', 'int'), ('view', 'int'), ('danmaku', 'int'), ('reply', 'int'),
+        ('favorite', 'int'), ('coin', 'int'), ('share', 'int'), ('like', 'int'),
+    )
+
+    def _row(self, video):
+        info = video._info or dict()
+        return (video.id, ) + tuple(info.get(name) for name, _ in self.columns[1:])
+
+
+
+class CommentTable(Table):
+    '''Comments, from `Comment` tuples
+    '''
+
+    columns = (
+        ('content', 'text'), ('like', 'int'), ('user_id', 'int'), ('timestamp', 'int'),
+        ('rpid', 'int'),
+    )
+
+    def _row(self, comment):
+        # by name, a field missing from `Comment` fails instead of shifting
+        return tuple(getattr(comment, name) for name, _ in self.columns)
+
+
+
+def _number(value, kind):
+    try:
+        return int(value) if kind == 'int' else float(value)
+    except (TypeError, ValueError):
+        return -1
@@ -0,0 +1,105 @@
+__all__ = ('CommentSync', )
+
+
+
+import json
+import math
+import os
+
+from .model import Video
+
+
+
+class CommentSync:
+    '''Incremental comment crawler of monitored videos
+
+    For each video the state keeps a watermark, the newest root comment
+    seen, and for each root comment its reply count and newest reply. A
+    sync reads root comments newest first, past the watermark, and requests
+    the reply pages of the threads whose reply count changed. It stops at
+    the first page of old root comments none of whose reply counts changed,
+    so replies under older, quiet root comments may be missed.
+
+    Without `threads`, it stops at the watermark and reads no replies, a
+    handful of requests for a video with few new comments.
+
+    Argument:
+        - path: [str, None], JSON file the state is loaded from and saved to
+        - threads: bool, also look for new replies under old root comments
+        - ps: int, number of replies per page of a thread
+
+    Example:
+        >>> sync = CommentSync('comments.json')
+        >>> for comment in sync.sync(video_id):
+        ...     print(comment)
+        >>> sync.save()
+    '''
+
+    def __init__(self, path=None, threads=True, ps=10):
+        self.path = path
+        self.threads = threads
+        self.ps = ps
+        self.state = dict()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = json.load(f)
+
+
+    def __repr__(self):
+        return f'<CommentSync @ {len(self.state)} videos>'
+
+
+    def sync(self, video):
+        '''Iterate comments of `video` (a `Video` or an aid) that are new since
+        the last sync, everything on the first one
+        '''
+        video = video if isinstance(video, Video) else Video(video, False)
+        state = self.state.setdefault(str(video.id), dict(rpid=0, roots=dict()))
+        roots, watermark, newest = state['roots'], state['rpid'], state['rpid']
+        page, done = 1, False
+        while not done:
+            # no data when the comments of the video are closed
+            data = video._comments_data_at(page, sort=0)['data']
+            if not data or not data['replies']:
+                break
+            # a page of old root comments with no new reply ends the sync
+            done = self.threads
+            for reply in data['replies']:
+                rpid = reply['rpid']
+                newest = max(newest, rpid)
+                if rpid > watermark:
+                    done = False
+                    yield Video._comment(reply)
+                elif not self.threads:
+                    done = True
+                    break
+                elif reply['rcount'] != roots.get(str(rpid), (0, 0))[0]:
+                    done = False
+                yield from self._thread(video, reply, roots)
+            page += 1
+        # the watermark moves only once every newer root comment was read
+        state['rpid'] = newest
+
+
+    def save(self):
+        if self.path:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(self.path + '.tmp', self.path)
+
+
+    def _thread(self, video, reply, roots):
+        # replies of a thread are listed oldest first, new ones are at the end
+        rpid, rcount = str(reply['rpid']), reply['rcount']
+        known_count, known_rpid = roots.get(rpid, (0, 0))
+        if rcount == known_count:
+            return
+        first_page = known_count//self.ps + 1
+        newest = known_rpid
+        for page in range(first_page, math.ceil(rcount/self.ps)+1):
+            data = video._comments_data_at(page, reply['rpid'], self.ps)['data']
+            for child in (data or dict()).get('replies') or ():
+                if child['rpid'] > known_rpid:
+                    newest = max(newest, child['rpid'])
+                    yield Video._comment(child)
+        roots[rpid] = (rcount, newest)
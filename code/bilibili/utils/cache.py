@@ -0,0 +1,263 @@
+__all__ = ('MemoryCache', 'SQLiteCache', 'TieredCache', 'TTLS', 'cache_key', 'ttl_of')
+
+
+
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+
+
+# seconds a response stays fresh, by path prefix; others are not cached
+TTLS = {
+    '/x/space/acc/info': 6*3600,
+    '/x/space/upstat': 6*3600,
+    '/x/relation/stat': 3600,
+    '/x/web-interface/view': 3600,
+    '/x/space/arc/search': 600,
+    '/x/relation/followers': 600,
+    '/x/relation/followings': 600,
+    '/x/v2/reply': 300,
+    '/dynamic_svr/v1/dynamic_svr/': 300,
+    '/room/v3/area/getRoomList': 10,
+}
+VOLATILE = frozenset(('_', ))  # parameters that never change the response
+
+
+
+def cache_key(url, params=None, cookies=None):
+    '''Return the key of a request, endpoint plus sorted parameters, plus a
+    fingerprint of `cookies` if any, so that a response fetched with a login
+    is never served to another login or to anonymous requests
+
+    Example:
+        >>> cache_key('https://api.bilibili.com/x/v2/reply', dict(pn=1, oid=2, _=3))
+        'api.bilibili.com/x/v2/reply?oid=2&pn=1'
+        >>> cache_key('https://api.bilibili.com/x/relation/followers', dict(vmid=2), dict(SESSDATA='...'))
+        'api.bilibili.com/x/relation/followers?vmid=2#00f81e6d410b6260'
+    '''
+    parts = urllib.parse.urlsplit(url)
+    items = sorted(
+        (str(key), str(value)) for key, value in (params or dict()).items()
+            if key not in VOLATILE
+    )
+    key = f'{parts.netloc}{parts.path}?{urllib.parse.urlencode(items)}'
+    if cookies:
+        cookies = urllib.parse.urlencode(sorted((str(k), str(v)) for k, v in dict(cookies).items()))
+        key += '#' + hashlib.sha256(cookies.encode()).hexdigest()[:16]
+    return key
+
+
+def ttl_of(url, ttls=TTLS):
+    '''Return the time to live of `url` in seconds, 0 if not cacheable
+    '''
+    path = urllib.parse.urlsplit(url).path
+    for prefix, ttl in ttls.items():
+        if path.startswith(prefix):
+            return ttl
+    return 0
+
+
+
+class Cache:
+    '''Base class of caches, values are JSON-serializable objects
+
+    API:
+        - property
+            - stats: dict
+        - function
+            - get(key: str) -> [object, None]
+            - set(key: str, value: object, ttl: [int, float])
+    '''
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return dict(
+            hits=self.hits, misses=self.misses,
+            ratio=self.hits/total if total else 0.0,
+        )
+
+
+    def get(self, key):
+        item = self._get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(item[0])
+
+
+    def set(self, key, value, ttl):
+        self._set(key, json.dumps(value, ensure_ascii=False), time.time()+ttl)
+
+
+
+class MemoryCache(Cache):
+    '''In-memory LRU cache
+
+    Argument:
+        - maxsize: int, number of responses kept
+    '''
+
+    def __init__(self, maxsize=4096):
+        super().__init__()
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<MemoryCache @ {len(self._data)}/{self.maxsize}>'
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item
+
+
+    def _set(self, key, value, expires):
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+
+class SQLiteCache(Cache):
+    '''Persistent cache in a SQLite file, least recently used responses are
+    evicted beyond `maxsize`
+
+    Argument:
+        - path: str, database file
+        - maxsize: int, number of responses kept
+    '''
+
+    def __init__(self, path='bilibili-cache.sqlite3', maxsize=1000000):
+        super().__init__()
+        self.path = path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)'
+        )
+        self._writes = 0
+
+
+    def __repr__(self):
+        return f'<SQLiteCache("{self.path}")>'
+
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key, ),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._connection.execute('DELETE FROM cache WHERE key = ?', (key, ))
+                return None
+            self._connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key),
+            )
+            return row
+
+
+    def _set(self, key, value, expires):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                (key, value, expires, time.time()),
+            )
+            self._writes += 1
+            # evicting is a scan, amortize it over many writes
+            if self._writes % 1000 == 0:
+                self._evict()
+
+
+    def _evict(self):
+        now = time.time()
+        self._connection.execute('DELETE FROM cache WHERE expires < ?', (now, ))
+        self._connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize, ),
+        )
+
+
+
+class TieredCache(Cache):
+    '''Chain of caches, e.g. memory in front of SQLite; hits of a later tier
+    are copied into the former ones
+
+    Example:
+        >>> cache = TieredCache(MemoryCache(), SQLiteCache('crawl.sqlite3'))
+        >>> set_transport(Transport(cache=cache))
+    '''
+
+    def __init__(self, *tiers):
+        super().__init__()
+        self.tiers = tiers
+
+
+    def __repr__(self):
+        return f'<TieredCache({", ".join(map(repr, self.tiers))})>'
+
+
+    def get(self, key):
+        for index, tier in enumerate(self.tiers):
+            item = tier._get(key)
+            if item is not None:
+                self.hits += 1
+                tier.hits += 1
+                for former in self.tiers[:index]:
+                    former._set(key, *item)
+                return json.loads(item[0])
+            tier.misses += 1
+        self.misses += 1
+        return None
+
+
+    def set(self, key, value, ttl):
+        value = json.dumps(value, ensure_ascii=False)
+        for tier in self.tiers:
+            tier._set(key, value, time.time()+ttl)
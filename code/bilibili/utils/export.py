@@ -0,0 +1,299 @@
+__all__ = ('JSONLWriter', 'ParquetWriter', 'export', 'to_record')
+
+
+
+import gzip
+import json
+import os
+
+
+
+def to_record(item):
+    '''Return a JSON-serializable dict of a model, a namedtuple or a dict,
+    without requesting anything
+
+    Example:
+        >>> to_record(Comment('hello', 1, 546195, 1585000000, 2544566912))
+        {'content': 'hello', 'like': 1, 'user_id': 546195, 'timestamp': 1585000000, 'rpid': 2544566912}
+    '''
+    if isinstance(item, dict):
+        return item
+    if hasattr(item, '_asdict'):
+        return item._asdict()
+    if hasattr(item, '_info'):
+        return dict(item._info or (), id=item.id)
+    # plain objects such as `Dynamic`, lazy attributes not loaded are skipped
+    names = getattr(item, '__dict__', None) or getattr(item, '__slots__', ())
+    record = dict()
+    for name in names:
+        if name.startswith('_'):
+            continue
+        try:
+            record[name] = object.__getattribute__(item, name)
+        except AttributeError:
+            pass
+    return record
+
+
+def export(items, writer):
+    '''Write every item of `items` with `writer`, return the number of items
+
+    Example:
+        >>> with JSONLWriter('comments-{part}.jsonl.gz', compress='gzip') as writer:
+        ...     export(video.comments, writer)
+    '''
+    number = 0
+    for item in items:
+        writer.write(item)
+        number += 1
+    return number
+
+
+
+class JSONLWriter:
+    '''Streaming JSON Lines writer with batching, rotation and compression
+
+    Records are buffered and written `batch_size` at a time; the file is
+    fsynced every `fsync_every` batches and when closed. When `path`
+    contains "{part}", a new file is started once the current one holds
+    `max_bytes` bytes (uncompressed).
+
+    Argument:
+        - path: str, e.g. 'videos.jsonl' or 'comments-{part:04d}.jsonl.gz'
+        - compress: [str, None], 'gzip' or None
+        - batch_size: int, number of records per write
+        - max_bytes: [int, None], bytes per file before rotating
+        - fsync_every: [int, None], number of batches between fsyncs, None
+            to fsync only when closing
+
+    API:
+        - property
+            - paths: list of str
+        - function
+            - write(item)
+            - flush()
+            - close()
+    '''
+
+    def __init__(self, path, compress=None, batch_size=1000, max_bytes=None,
+            fsync_every=10):
+        if compress not in (None, 'gzip'):
+            raise ValueError(f'Unknown compression {compress!r}.')
+        self.path = path
+        self.compress = compress
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes if '{part' in path else None
+        self.fsync_every = fsync_every
+        self.paths = list()
+        self._batch = list()
+        self._batches = 0
+        self._bytes = 0
+        self._raw = None
+        self._file = None
+
+
+    def __repr__(self):
+        return f'<JSONLWriter("{self.path}") @ {len(self.paths)} files>'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def write(self, item):
+        self._batch.append(json.dumps(to_record(item), ensure_ascii=False))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+        if not self._batch:
+            return
+        data = ('\n'.join(self._batch) + '\n').encode('utf-8')
+        self._batch.clear()
+        if self._file is None or self.max_bytes and self._bytes >= self.max_bytes:
+            self._open()
+        self._file.write(data)
+        self._bytes += len(data)
+        self._batches += 1
+        if self.fsync_every and self._batches % self.fsync_every == 0:
+            self._sync()
+
+
+    def close(self):
+        self.flush()
+        self._close()
+
+
+    def _open(self):
+        self._close()
+        path = self.path.format(part=len(self.paths))
+        self._raw = open(path, 'wb')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress else self._raw
+        self._bytes = 0
+        self.paths.append(path)
+
+
+    def _close(self):
+        if self._file is not None:
+            if self._file is not self._raw:
+                self._file.close()  # writes the gzip trailer
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            self._raw.close()
+            self._file = self._raw = None
+
+
+    def _sync(self):
+        if self._file is not self._raw:
+            self._file.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+
+
+class ParquetWriter:
+    '''Streaming Parquet writer, one row group per batch; requires `pyarrow`
+
+    Argument:
+        - path: str, e.g. 'videos.parquet' or 'comments-{part:04d}.parquet'
+        - batch_size: int, number of records per row group
+        - max_rows: [int, None], rows per file before rotating, only when
+            `path` contains "{part}"
+        - compression: str, codec of `pyarrow.parquet`
+        - schema: [pyarrow.Schema, None], columns of every file; keys
+            missing from a record are null, others are dropped
+
+    Without `schema`, columns are inferred from the first batch of a file,
+    a column of None only is a string column. A later batch missing columns
+    gets nulls, one whose values cannot be cast to the columns of the file,
+    or with more columns, e.g. dynamics of another type, starts a new file;
+    "videos.parquet" is followed by "videos-1.parquet" and so on.
+
+    Example:
+        >>> schema = pyarrow.schema([('content', pyarrow.string()), ('like', pyarrow.int64())])
+        >>> with ParquetWriter('comments.parquet', schema=schema) as writer:
+        ...     export(video.comments, writer)
+    '''
+
+    def __init__(self, path, batch_size=10000, max_rows=None, compression='zstd', schema=None):
+        import pyarrow
+        import pyarrow.parquet
+        self._pyarrow = pyarrow
+        self.path = path
+        self.batch_size = batch_size
+        self.max_rows = max_rows if '{part' in path else None
+        self.compression = compression
+        self.schema = schema
+        self.paths = list()
+        self._batch = list()
+        self._rows = 0
+        self._writer = None
+
+
+    def __repr__(self):
+        return f'<ParquetWriter("{self.path}") @ {len(self.paths)} files>'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def write(self, item):
+        self._batch.append(to_record(item))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+        if not self._batch:
+            return
+        table = self._table(self._batch)
+        self._batch.clear()
+        if self._writer is None or self.max_rows and self._rows >= self.max_rows:
+            self._open(table.schema)
+        elif not table.schema.equals(self._writer.schema):
+            conformed = self._conform(table, self._writer.schema)
+            if conformed is None:
+                self._open(table.schema)
+            else:
+                table = conformed
+        self._writer.write_table(table)
+        self._rows += table.num_rows
+
+
+    def close(self):
+        self.flush()
+        self._close()
+
+
+    def _table(self, records):
+        pyarrow = self._pyarrow
+        if self.schema is not None:
+            return pyarrow.Table.from_pylist(records, schema=self.schema)
+        # columns of every record, `from_pylist` only reads the first one
+        names = dict.fromkeys(name for record in records for name in record)
+        table = pyarrow.Table.from_pydict({
+            name: [record.get(name) for record in records] for name in names
+        })
+        schema = pyarrow.schema([field.with_type(self._known(field.type)) for field in table.schema])
+        return table if schema.equals(table.schema) else table.cast(schema)
+
+
+    def _known(self, type):
+        # null types, i.e. None only so far, become strings
+        types = self._pyarrow.types
+        if types.is_null(type):
+            return self._pyarrow.string()
+        if types.is_struct(type):
+            return self._pyarrow.struct([
+                type.field(index).with_type(self._known(type.field(index).type))
+                    for index in range(type.num_fields)
+            ])
+        if types.is_list(type):
+            return self._pyarrow.list_(self._known(type.value_type))
+        return type
+
+
+    def _conform(self, table, schema):
+        # the table with the columns of `schema`, None if it does not fit
+        if set(table.column_names) - set(schema.names):
+            return None
+        columns = list()
+        for field in schema:
+            if field.name not in table.column_names:
+                columns.append(self._pyarrow.nulls(table.num_rows, field.type))
+                continue
+            try:
+                columns.append(table.column(field.name).cast(field.type))
+            except self._pyarrow.ArrowException:
+                return None
+        return self._pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+    def _open(self, schema):
+        self._close()
+        if '{part' in self.path:
+            path = self.path.format(part=len(self.paths))
+        elif self.paths:
+            root, extension = os.path.splitext(self.path)
+            path = f'{root}-{len(self.paths)}{extension}'
+        else:
+            path = self.path
+        self._writer = self._pyarrow.parquet.ParquetWriter(path, schema, compression=self.compression)
+        self._rows = 0
+        self.paths.append(path)
+
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -1 +1 @@
-from .greeting import choose_greeting_list
+from .greeting import choose_greeting_list, GreetingBook
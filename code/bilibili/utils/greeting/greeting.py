@@ -1,19 +1,26 @@
 import os
+import random
+import threading
+import time
 from datetime import datetime
 from collections import defaultdict
 
 
+TIMETABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "timetable")
+
+
 # First element for time, second element for msg, delete \n and split with white space
 # return a dict with {time: [data]}, if file not exists, use default greeting.
+# Lines without a msg are skipped.
 def read_file(filepath):
     msg = defaultdict(list)
     print("Loading greeting msg from file!")
     if file_availability(filepath):
         with open(filepath, "r", encoding='utf-8') as f:
-            for line in f.readlines():
-                line = line.strip("\n")
-                data = line.split(" ")
-                msg[data[0]].append(data[1])
+            for line in f:
+                data = line.split(maxsplit=1)
+                if len(data) == 2:
+                    msg[data[0]].append(data[1].strip())
     return msg
 
 
@@ -24,30 +31,114 @@ def file_availability(filepath):
     return True
 
 
-def load_timetable():
+# Return {hour: dur} in file order, lines without a valid hour are skipped.
+def load_timetable(filepath=TIMETABLE):
     msg = {}
-    with open("timetable", "r", encoding='utf-8') as f:
-        for line in f.readlines():
-            line = line.strip("\n")
-            data = line.split(" ")
-            msg[data[0]] = data[1]
+    with open(filepath, "r", encoding='utf-8') as f:
+        for line in f:
+            data = line.split()
+            if len(data) >= 2 and data[0].isdigit() and int(data[0]) < 24:
+                msg[data[0]] = data[1]
     return msg
 
 
+# Precompute the dur of each of the 24 hours, as `choose_current_time_dur` does:
+# before the first hour of the table, the first dur; else the last one started.
+def hour_table(table):
+    keys = list(table)
+    if not keys:
+        return [""] * 24
+    durs = []
+    for hour in range(24):
+        dur = table[keys[0]] if hour < int(keys[0]) else ""
+        for key in keys:
+            if hour >= int(key):
+                dur = table[key]
+        durs.append(dur)
+    return durs
+
+
 # Load timetable from file and select current time
 def choose_current_time_dur():
-    current = datetime.now().hour
-    table = load_timetable()
-    keys = table.keys()
-    dur = ""
-    if current < int(list(table)[0]):
-        return table[list(table)[0]]
-    for key in keys:
-        if current >= int(key):
-            dur = table[key]
-    return dur
+    return hour_table(load_timetable())[datetime.now().hour]
 
 
 # Choose greeting list from time_table
 def choose_greeting_list(filepath):
-    return read_file(filepath)[choose_current_time_dur()]
+    if filepath not in _books:
+        _books[filepath] = GreetingBook(filepath)
+    return _books[filepath].greetings()
+
+
+# Greetings of each hour, loaded once and reloaded when a file changes.
+# Files are checked at most every `check_every` seconds.
+#
+# Example:
+#     >>> book = GreetingBook("greeting")
+#     >>> book.choose()       # random greeting of the current hour
+#     >>> book.next(hour=19)  # greetings of 19h in turn
+class GreetingBook:
+    def __init__(self, filepath, timetable=TIMETABLE, check_every=1.0):
+        self.filepath = filepath
+        self.timetable = timetable
+        self.check_every = check_every
+        self._mtimes = None
+        self._checked = 0
+        self._hours = [[] for _ in range(24)]
+        self._turns = [0] * 24
+        self._lock = threading.Lock()
+        self.reload()
+
+
+    def __repr__(self):
+        return f'<GreetingBook("{self.filepath}")>'
+
+
+    # Reload both files if one of them changed, return whether it did.
+    def reload(self):
+        mtimes = (_mtime(self.filepath), _mtime(self.timetable))
+        with self._lock:
+            self._checked = time.monotonic()
+            if mtimes == self._mtimes:
+                return False
+            msg = read_file(self.filepath)
+            durs = hour_table(load_timetable(self.timetable))
+            self._hours = [msg.get(dur, []) for dur in durs]
+            self._turns = [0] * 24
+            self._mtimes = mtimes
+            return True
+
+
+    # Greeting list of `hour`, the current hour by default
+    def greetings(self, hour=None):
+        if time.monotonic() - self._checked >= self.check_every:
+            self.reload()
+        return self._hours[datetime.now().hour if hour is None else hour]
+
+
+    # A random greeting of `hour`, None when there is none
+    def choose(self, hour=None):
+        greetings = self.greetings(hour)
+        return random.choice(greetings) if greetings else None
+
+
+    # The greetings of `hour` in turn, None when there is none
+    def next(self, hour=None):
+        hour = datetime.now().hour if hour is None else hour
+        greetings = self.greetings(hour)
+        if not greetings:
+            return None
+        with self._lock:
+            turn = self._turns[hour]
+            self._turns[hour] = turn + 1
+        return greetings[turn % len(greetings)]
+
+
+_books = {}
+
+
+def _mtime(filepath):
+    try:
+        return os.stat(filepath).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,224 @@
+__all__ = ('Event', 'Metrics', 'SpanHook', 'endpoint_of')
+
+
+
+import array
+import bisect
+import collections
+import json
+import threading
+import time
+import urllib.parse
+
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+Event = collections.namedtuple('Event', (
+    'endpoint', 'params', 'status', 'code', 'bytes', 'latency', 'retries', 'cache_hit', 'error',
+))
+Event.__doc__ = '''One API call as seen by a transport hook
+
+    - endpoint: str, host and path, e.g. 'api.bilibili.com/x/v2/reply'
+    - params: [dict, None], query parameters
+    - status: [int, None], HTTP status of the last attempt, None on a cache
+        hit or when no response came back
+    - code: [int, None], `code` of the JSON body
+    - bytes: int, size of the response body
+    - latency: float, seconds, retries and waits for the rate limiter included
+    - retries: int, number of attempts after the first one
+    - cache_hit: bool
+    - error: [Exception, None], the error raised to the caller
+'''
+
+
+
+def endpoint_of(url):
+    parts = urllib.parse.urlsplit(url)
+    return parts.netloc + parts.path
+
+
+
+class Metrics:
+    '''In-process counters and latency histograms of each endpoint
+
+    An instance is a transport hook, it counts every event it is called
+    with. Quantiles are interpolated from the histogram buckets, as
+    Prometheus does.
+
+    Argument:
+        - buckets: tuple of float, upper bounds of the latency histogram
+
+    API:
+        - function
+            - snapshot() -> dict
+            - quantile(endpoint: str, q: float) -> float
+            - prometheus(prefix: str) -> str
+            - reset()
+
+    Example:
+        >>> metrics = Metrics()
+        >>> set_transport(Transport(hooks=[metrics]))
+        >>> list(User(546195, False).videos)
+        >>> metrics.snapshot()['api.bilibili.com/x/space/arc/search']['p99']
+        0.25
+        >>> print(metrics.prometheus())
+    '''
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._series = dict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<Metrics @ {len(self._series)} endpoints>'
+
+
+    def __call__(self, event):
+        with self._lock:
+            series = self._series.get(event.endpoint)
+            if series is None:
+                series = self._series[event.endpoint] = _Series(len(self.buckets))
+            series.add(event, bisect.bisect_left(self.buckets, event.latency))
+
+
+    def snapshot(self):
+        '''Return {endpoint: dict of counters and latency quantiles}
+        '''
+        with self._lock:
+            return {
+                endpoint: dict(
+                    requests=series.count, errors=series.errors,
+                    cache_hits=series.cache_hits, retries=series.retries,
+                    bytes=series.bytes, latency=series.latency,
+                    statuses=dict(series.statuses),
+                    p50=self._quantile(series, 0.5),
+                    p90=self._quantile(series, 0.9),
+                    p99=self._quantile(series, 0.99),
+                )
+                    for endpoint, series in self._series.items()
+            }
+
+
+    def quantile(self, endpoint, q):
+        with self._lock:
+            series = self._series.get(endpoint)
+            return series and self._quantile(series, q)
+
+
+    def prometheus(self, prefix='bilibili'):
+        '''Return every metric in the Prometheus text exposition format
+        '''
+        lines = list()
+        def family(name, kind, description):
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+        with self._lock:
+            series = sorted(self._series.items())
+            family('requests_total', 'counter', 'API calls by HTTP status.')
+            for endpoint, item in series:
+                for status, number in sorted(item.statuses.items(), key=str):
+                    lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {number}')
+            for name, attribute, description in (
+                ('cache_hits_total', 'cache_hits', 'API calls answered by the cache.'),
+                ('retries_total', 'retries', 'Retried attempts of API calls.'),
+                ('errors_total', 'errors', 'API calls that raised an error.'),
+                ('response_bytes_total', 'bytes', 'Bytes of response bodies.'),
+            ):
+                family(name, 'counter', description)
+                for endpoint, item in series:
+                    lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {getattr(item, attribute)}')
+            family('request_duration_seconds', 'histogram', 'Latency of API calls.')
+            for endpoint, item in series:
+                cumulative = 0
+                for bound, number in zip(self.buckets + ('+Inf', ), item.histogram):
+                    cumulative += number
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {item.latency}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{endpoint="{endpoint}"}} {item.count}')
+        return '\n'.join(lines) + '\n'
+
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+    def _quantile(self, series, q):
+        if not series.count:
+            return 0.0
+        rank, cumulative = q*series.count, 0
+        for index, number in enumerate(series.histogram):
+            if number and cumulative + number >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index-1] if index else 0.0
+                return lower + (self.buckets[index]-lower) * (rank-cumulative)/number
+            cumulative += number
+        return self.buckets[-1]
+
+
+
+class _Series:
+    __slots__ = ('count', 'errors', 'cache_hits', 'retries', 'bytes', 'latency', 'statuses', 'histogram')
+
+    def __init__(self, number_of_buckets):
+        self.count = self.errors = self.cache_hits = self.retries = self.bytes = 0
+        self.latency = 0.0
+        self.statuses = collections.Counter()
+        self.histogram = array.array('Q', bytes(8*(number_of_buckets+1)))
+
+
+    def add(self, event, bucket):
+        self.count += 1
+        self.errors += event.error is not None
+        self.cache_hits += event.cache_hit
+        self.retries += event.retries
+        self.bytes += event.bytes
+        self.latency += event.latency
+        self.statuses['cache' if event.cache_hit else event.status or 'error'] += 1
+        self.histogram[bucket] += 1
+
+
+
+class SpanHook:
+    '''Transport hook recording each API call as an OpenTelemetry span;
+    requires `opentelemetry-api`
+
+    Spans are started in the current context, so they are children of any
+    span the crawl runs in.
+
+    Example:
+        >>> set_transport(Transport(hooks=[SpanHook()]))
+    '''
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer('bilibili')
+
+
+    def __repr__(self):
+        return f'<SpanHook @ {self.tracer}>'
+
+
+    def __call__(self, event):
+        end = time.time_ns()
+        attributes = {
+            'http.method': 'GET',
+            'http.url': 'https://' + event.endpoint,
+            'bilibili.params': json.dumps(event.params or {}, ensure_ascii=False, default=str),
+            'bilibili.bytes': event.bytes,
+            'bilibili.retries': event.retries,
+            'bilibili.cache_hit': event.cache_hit,
+        }
+        event.status is None or attributes.update({'http.status_code': event.status})
+        event.code is None or attributes.update({'bilibili.code': event.code})
+        span = self.tracer.start_span(
+            f'GET {event.endpoint}', start_time=end - int(event.latency*1e9),
+            kind=self._trace.SpanKind.CLIENT, attributes=attributes,
+        )
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(event.error)))
+        span.end(end_time=end)
@@ -0,0 +1,38 @@
+__all__ = ('prefetch', )
+
+
+
+import collections
+import concurrent.futures
+
+
+
+def prefetch(function, arguments, window=4):
+    '''Call `function` on each item of `arguments` in a thread pool, keeping
+    at most `window` calls in flight, and yield the results in order
+
+    Argument:
+        - function: callable
+        - arguments: iterable, each item is passed as the only argument
+        - window: int, number of calls running ahead of the consumer
+
+    Example:
+        >>> for page in prefetch(fetch_page, range(1, 35), window=8):
+        ...     print(page)
+    '''
+    if window <= 1:
+        yield from map(function, arguments)
+        return
+    futures = collections.deque()
+    executor = concurrent.futures.ThreadPoolExecutor(window)
+    try:
+        for argument in arguments:
+            futures.append(executor.submit(function, argument))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
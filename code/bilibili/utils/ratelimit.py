@@ -0,0 +1,149 @@
+__all__ = ('TokenBucket', 'RateLimiter', 'Backoff', 'THROTTLE_CODES', 'THROTTLE_STATUS')
+
+
+
+import random
+import threading
+import time
+
+
+
+# codes of the JSON body meaning "too frequent" or "intercepted"
+THROTTLE_CODES = frozenset((-412, -509, -799))
+# HTTP status codes meaning the same, other transient ones such as 503 are not
+THROTTLE_STATUS = frozenset((412, 429))
+
+
+
+class TokenBucket:
+    '''Token bucket whose rate adapts with AIMD
+
+    The rate grows by `increase` per second after each success and is
+    multiplied by `decrease` when the server throttles, between `minimum`
+    and `maximum` requests per second.
+
+    Argument:
+        - rate: [int, float], initial requests per second
+        - burst: int, number of tokens the bucket holds
+    '''
+
+    def __init__(self, rate=10, burst=10, minimum=0.5, maximum=50,
+            increase=0.1, decrease=0.5):
+        self.rate = rate
+        self.burst = burst
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused = 0.0
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<TokenBucket @ {self.rate:.2f}/s>'
+
+
+    def acquire(self):
+        '''Block until a token is available
+        '''
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+    def reserve(self):
+        '''Take a token and return 0 if one is available, else return the
+        seconds to wait before trying again, for callers that must not block,
+        e.g. `await asyncio.sleep(bucket.reserve())`
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now-self._updated)*self.rate)
+            self._updated = now
+            if now >= self._paused and self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return max(self._paused-now, (1-self._tokens)/self.rate)
+
+
+    def success(self):
+        with self._lock:
+            self.rate = min(self.maximum, self.rate + self.increase)
+
+
+    def throttled(self, retry_after=None):
+        '''Slow down, and pause the bucket for `retry_after` seconds if given
+        '''
+        with self._lock:
+            self.rate = max(self.minimum, self.rate * self.decrease)
+            self._tokens = 0
+            if retry_after:
+                self._paused = max(self._paused, time.monotonic() + retry_after)
+
+
+
+class RateLimiter:
+    '''One `TokenBucket` per host
+
+    Argument:
+        - rates: dict, {host: requests per second}, initial rates
+        - **kwargs: arguments of each `TokenBucket`
+
+    Example:
+        >>> limiter = RateLimiter({'api.live.bilibili.com': 5}, maximum=20)
+        >>> set_transport(Transport(limiter=limiter))
+    '''
+
+    def __init__(self, rates=None, **kwargs):
+        self.rates = dict(rates or ())
+        self.kwargs = kwargs
+        self._buckets = dict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<RateLimiter({self._buckets})>'
+
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                kwargs = dict(self.kwargs)
+                if host in self.rates:
+                    kwargs['rate'] = self.rates[host]
+                self._buckets[host] = TokenBucket(**kwargs)
+            return self._buckets[host]
+
+
+
+class Backoff:
+    '''Jittered exponential backoff
+
+    Argument:
+        - retries: int, number of retries after the first attempt
+        - base: [int, float], seconds before the first retry
+        - cap: [int, float], maximum seconds between two attempts
+
+    Example:
+        >>> for delay in Backoff(retries=3):
+        ...     time.sleep(delay)
+    '''
+
+    def __init__(self, retries=5, base=0.5, cap=30):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+
+    def __repr__(self):
+        return f'<Backoff({self.retries} retries)>'
+
+
+    def __iter__(self):
+        # "full jitter", uniformly random up to the exponential bound
+        for attempt in range(self.retries):
+            yield random.uniform(0, min(self.cap, self.base * 2**attempt))
@@ -0,0 +1,26 @@
+__all__ = ('run_every', )
+
+
+
+import time
+
+
+
+def run_every(poll, interval, callback=print, rounds=None):
+    '''Call `poll()` every `interval` seconds and `callback(item)` for each
+    item it yields, `rounds` times or forever
+
+    A slow poll eats into the interval, the next one starts `interval`
+    seconds after the previous one started, or at once if that is past.
+
+    Example:
+        >>> run_every(lambda: follower.poll(mids), 600, callback=print)
+    '''
+    done = 0
+    while rounds is None or done < rounds:
+        start = time.monotonic()
+        for item in poll():
+            callback(item)
+        done += 1
+        if rounds is None or done < rounds:
+            time.sleep(max(0, interval - (time.monotonic()-start)))
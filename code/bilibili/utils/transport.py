@@ -0,0 +1,330 @@
+__all__ = (
+    'Transport', 'get_transport', 'set_transport',
+    'redirected', 'retry_after', 'transient_failure', 'is_throttled', 'retry_delay',
+)
+
+
+
+import http.cookiejar
+import requests
+import requests.adapters
+import threading
+import time
+import urllib.parse
+import warnings
+
+from .agents import user_agent
+from .cache import TTLS, cache_key, ttl_of
+from .metrics import Event, endpoint_of
+from .ratelimit import THROTTLE_CODES, THROTTLE_STATUS, Backoff, RateLimiter
+
+
+
+HOSTS = ('api.bilibili.com', 'api.vc.bilibili.com', 'api.live.bilibili.com')
+REFERERS = {
+    'api.live.bilibili.com': 'https://live.bilibili.com',
+}
+TRANSIENT_STATUS = frozenset((412, 429, 500, 502, 503, 504))
+
+
+
+class Transport:
+    '''Process-wide HTTP transport, one keep-alive pool per host
+
+    Every host gets its own `requests.Session` with a bounded connection
+    pool, so that all models talking to the same host reuse connections
+    instead of paying a TCP/TLS handshake for each object.
+
+    Argument:
+        - pool_size: int, maximum number of connections kept per host
+        - limits: dict, {host: pool_size}, per-host override of `pool_size`
+        - block: bool, wait for a free connection instead of opening an
+            extra one when the pool of a host is exhausted
+        - timeout: [int, float], timeout of each request in seconds
+        - cache: [Cache, None], cache of successful JSON responses
+        - ttls: dict, {path prefix: seconds}, freshness of cached responses
+        - limiter: [RateLimiter, None, False], requests per second of each
+            host, adapting to throttling; None for the default, False to disable
+        - backoff: [Backoff, None], delays between retries of transient
+            failures; None for the default
+        - redirect: dict, {host: base url}, send requests of a host to
+            another server instead, e.g. a local mock API
+        - hooks: iterable, functions called with an `Event` after each
+            `get_json`, e.g. `Metrics()` or `SpanHook()`
+
+    API:
+        - property
+            - stats: dict
+        - function
+            - session(host: str)
+            - request(method: str, url: str, **kwargs)
+            - get(url: str, **kwargs)
+            - post(url: str, **kwargs)
+            - get_json(url: str, params: dict, **kwargs)
+            - add_hook(hook)
+            - close()
+
+    Example:
+        >>> transport = Transport(limits={'api.live.bilibili.com': 4})
+        >>> transport.get_json(url, params=dict(mid=546195))
+    '''
+
+    def __init__(self, pool_size=10, limits=None, block=True, timeout=10,
+            cache=None, ttls=TTLS, limiter=None, backoff=None, redirect=None,
+            hooks=()):
+        self.pool_size = pool_size
+        self.limits = dict(limits or ())
+        self.block = block
+        self.timeout = timeout
+        self.cache = cache
+        self.ttls = ttls
+        self.limiter = RateLimiter() if limiter is None else limiter
+        self.backoff = Backoff() if backoff is None else backoff
+        self.redirect = dict(redirect or ())
+        self.hooks = list(hooks)
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+
+    def __repr__(self):
+        return f'<Transport @ {len(self._sessions)} hosts>'
+
+
+    @property
+    def stats(self):
+        '''Return connection counters of each host
+
+        Example:
+            >>> transport.stats
+            {'api.bilibili.com': {'requests': 35, 'connections': 2, 'reused': 33}}
+        '''
+        stats = dict()
+        for host, session in list(self._sessions.items()):
+            number_of_requests, number_of_connections = 0, 0
+            for pool in self._pools(session):
+                number_of_requests += pool.num_requests
+                number_of_connections += pool.num_connections
+            stats[host] = dict(
+                requests=number_of_requests,
+                connections=number_of_connections,
+                reused=number_of_requests - number_of_connections,
+            )
+        return stats
+
+
+    def session(self, host):
+        '''Return the shared session of `host`
+        '''
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = self._new_session(host)
+            return self._sessions[host]
+
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        host = urllib.parse.urlsplit(url).hostname
+        return self.session(host).request(method, redirected(url, self.redirect), **kwargs)
+
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+    def get_json(self, url, params=None, **kwargs):
+        '''Send a GET request and return the decoded JSON body, answered by
+        the cache when a fresh response is there; responses to requests with
+        cookies are cached per set of cookies
+        '''
+        start = time.perf_counter()
+        ttl = self.cache is not None and ttl_of(url, self.ttls)
+        if ttl:
+            key = cache_key(url, params, kwargs.get('cookies'))
+            data = self.cache.get(key)
+            if data is not None:
+                self.hooks and self._emit(url, params, start, data, cache_hit=True)
+                return data
+        attempt = dict(status=None, bytes=0, retries=0)
+        try:
+            data = self._get_json(url, params, attempt, **kwargs)
+        except Exception as e:
+            self.hooks and self._emit(url, params, start, None, error=e, **attempt)
+            raise
+        # only successful responses, errors such as -412 must be retried
+        if ttl and data.get('code') == 0:
+            self.cache.set(key, data, ttl)
+        self.hooks and self._emit(url, params, start, data, **attempt)
+        return data
+
+
+    def add_hook(self, hook):
+        '''Call `hook(event)` after each `get_json`, see `Event`
+        '''
+        self.hooks.append(hook)
+
+
+    def _emit(self, url, params, start, data, status=None, bytes=0, retries=0,
+            cache_hit=False, error=None):
+        code = data.get('code') if isinstance(data, dict) else None
+        event = Event(
+            endpoint_of(url), params, status, code, bytes,
+            time.perf_counter() - start, retries, cache_hit, error,
+        )
+        for hook in self.hooks:
+            # a broken hook must not break the crawl
+            try:
+                hook(event)
+            except Exception as e:
+                warnings.warn(f'Hook {hook!r} failed: {e}', Warning)
+
+
+    def _get_json(self, url, params, attempt, **kwargs):
+        # rate limited, transient failures and throttling are retried
+        bucket = self.limiter and self.limiter.bucket(urllib.parse.urlsplit(url).hostname)
+        delays = iter(self.backoff)
+        while True:
+            bucket and bucket.acquire()
+            attempt.update(status=None, bytes=0)
+            data, wait = None, None
+            try:
+                response = self.get(url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                attempt['status'] = response.status_code
+                attempt['bytes'] = len(response.content)
+                wait = retry_after(response)
+                failure = transient_failure(url, response.status_code)
+                if failure is None:
+                    data = response.json()
+                    failure = transient_failure(url, response.status_code, data)
+                    if failure is None:
+                        bucket and bucket.success()
+                        return data
+                error = requests.HTTPError(failure, response=response)
+            delay = retry_delay(delays, bucket, is_throttled(attempt['status'], data), wait)
+            if delay is None:
+                raise error
+            attempt['retries'] += 1
+            time.sleep(delay)
+
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, dict()
+        for session in sessions.values():
+            session.close()
+
+
+    def _new_session(self, host):
+        size = self.limits.get(host, self.pool_size)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=2, pool_maxsize=size, pool_block=self.block,
+        )
+        session = requests.Session()
+        # cookies are sent per request; a Set-Cookie answering one user must
+        # not be kept and sent with the requests of every other caller
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=()))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'referer': REFERERS.get(host, 'https://www.bilibili.com'),
+            'user-agent': user_agent(),
+        })
+        return session
+
+
+    def _pools(self, session):
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    yield pool
+
+
+
+def redirected(url, redirect):
+    '''Return `url` sent to the base url of its host in `redirect`, if any
+    '''
+    parts = urllib.parse.urlsplit(url)
+    if parts.hostname in redirect:
+        return redirect[parts.hostname] + url[len(f'{parts.scheme}://{parts.netloc}'):]
+    return url
+
+
+def retry_after(response):
+    '''Return the seconds of the Retry-After header of `response`, None
+    when there is none
+    '''
+    try:
+        return float(response.headers.get('retry-after', ''))
+    except ValueError:
+        return None
+
+
+def transient_failure(url, status, data=None):
+    '''Return the message of a transient failure to retry, None when the
+    response can be used; with the status only, then with `data`, the
+    decoded body
+
+    A body that is not JSON, e.g. an HTML error page, is not transient: its
+    decoding error is raised at once.
+
+    Example:
+        >>> transient_failure(url, 503)
+        '503 for https://api.bilibili.com/x/v2/reply'
+        >>> transient_failure(url, 200, dict(code=-412, message='请求被拦截'))
+        '-412 请求被拦截 for https://api.bilibili.com/x/v2/reply'
+    '''
+    if status in TRANSIENT_STATUS:
+        return f'{status} for {url}'
+    if isinstance(data, dict) and data.get('code') in THROTTLE_CODES:
+        return f'{data.get("code")} {data.get("message")} for {url}'
+    return None
+
+
+def is_throttled(status, data=None):
+    '''Whether the server asks to slow down, plain server errors do not
+    '''
+    return status in THROTTLE_STATUS or isinstance(data, dict) and data.get('code') in THROTTLE_CODES
+
+
+def retry_delay(delays, bucket, throttled, retry_after=None):
+    '''Slow `bucket` down if `throttled`, return the seconds to wait before
+    the next attempt, None when `delays` has no retry left
+    '''
+    throttled and bucket and bucket.throttled(retry_after)
+    delay = next(delays, None)
+    return None if delay is None else max(delay, retry_after or 0)
+
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+
+def get_transport():
+    '''Return the process-wide transport, create it on first use
+    '''
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
+
+
+def set_transport(transport):
+    '''Replace the process-wide transport, e.g. to change pool limits
+
+    Example:
+        >>> set_transport(Transport(pool_size=32))
+    '''
+    global _transport
+    with _transport_lock:
+        _transport = transport
@@ -1,7 +1,11 @@
-__all__ = ('debug', 'bv2av', 'av2bv')
+__all__ = (
+    'debug', 'bv2av', 'av2bv', 'bv2av_many', 'av2bv_many', 'scan_ids',
+    'InvalidIDError',
+)
 
 
 
+import re
 import sys
 
 
@@ -11,6 +15,16 @@ tr = dict(map(reversed, enumerate(table)))
 s = [11, 10, 3, 8, 4, 6]
 xor = 177451812
 add = 8728348608
+powers = [58**i for i in range(6)]
+# the 6 digits are at `s`, the other characters are fixed
+BV = re.compile(r'[Bb][Vv]1[{0}]{{2}}4[{0}]1[{0}]7[{0}]{{2}}'.format(table))
+AV = re.compile(r'[Aa][Vv](\d{1,10})')
+IDS = re.compile(r'(?<![0-9A-Za-z])(?:({0})|{1})(?![0-9A-Za-z])'.format(BV.pattern, AV.pattern))
+
+
+
+class InvalidIDError(ValueError):
+    pass
 
 
 
@@ -25,8 +39,7 @@ def bv2av(x):
         >>> bv2av('BV1A7411w71V')
         'av90501130'
     '''
-    r = sum(tr[x[s[i]]]*58**i for i in range(6))
-    return f'av{(r-add)^xor}'
+    return f'av{_bv2av(x)}'
 
 
 def av2bv(x):
@@ -35,9 +48,122 @@ def av2bv(x):
         >>> av2bv('AV90501130')
         'BV1A7411w71V'
     '''
-    x = int(x.replace('av', '').replace('AV', ''))
+    return _av2bv(_aid(x))
+
+
+def bv2av_many(xs):
+    '''Convert many BV ids to AV numbers; a NumPy array of strings is
+    converted vectorized into an int64 array
+
+    Example:
+        >>> bv2av_many(['BV1A7411w71V', 'BV1xx411c7mD'])
+        [90501130, 2]
+    '''
+    if type(xs).__module__ == 'numpy':
+        return _bv2av_numpy(xs)
+    return [_bv2av(x) for x in xs]
+
+
+def av2bv_many(xs):
+    '''Convert many AV ids (int or 'av...') to BV ids; a NumPy array of ints
+    is converted vectorized into an array of strings
+
+    Example:
+        >>> av2bv_many([90501130, 'av2'])
+        ['BV1A7411w71V', 'BV1xx411c7mD']
+    '''
+    if type(xs).__module__ == 'numpy':
+        return _av2bv_numpy(xs)
+    return [_av2bv(_aid(x)) for x in xs]
+
+
+def scan_ids(text):
+    '''Find every BV and AV id in `text` in a single pass, return the AV
+    numbers in order of appearance
+
+    Example:
+        >>> scan_ids('see BV1A7411w71V and av2!')
+        [90501130, 2]
+    '''
+    return [
+        _bv2av(match.group(1)) if match.group(1) else int(match.group(2))
+            for match in IDS.finditer(text)
+    ]
+
+
+def _bv2av(x):
+    if not isinstance(x, str) or not BV.fullmatch(x):
+        raise InvalidIDError(f'Invalid BV id {x!r}.')
+    r = sum(tr[x[s[i]]]*powers[i] for i in range(6))
+    return (r-add)^xor
+
+
+def _av2bv(x):
+    if x <= 0:
+        raise InvalidIDError(f'AV id {x} out of range.')
     x = (x^xor) + add
+    if not 0 <= x < 58**6:
+        raise InvalidIDError(f'AV id {(x-add)^xor} out of range.')
     r = list('BV1  4 1 7  ')
     for i in range(6):
-        r[s[i]] = table[x//58**i%58]
+        r[s[i]] = table[x//powers[i]%58]
     return ''.join(r)
+
+
+def _aid(x):
+    if isinstance(x, str):
+        x = x[2:] if x[:2].lower() == 'av' else x
+        if not x.isdigit():
+            raise InvalidIDError(f'Invalid AV id {x!r}.')
+    # bool is an int, av2bv(True) is a mistake
+    elif not isinstance(x, int) or isinstance(x, bool):
+        raise InvalidIDError(f'Invalid AV id {x!r}.')
+    return int(x)
+
+
+def _bv2av_numpy(xs):
+    import numpy
+    codes = numpy.full(256, -1, dtype=numpy.int64)
+    codes[numpy.frombuffer(table.encode(), dtype=numpy.uint8)] = numpy.arange(58)
+    xs = _ids_numpy(xs)
+    if xs.dtype.kind not in 'US':
+        xs = xs.astype(str)
+    # the cast to S12 below would silently cut longer strings
+    wrong = numpy.char.str_len(xs) != 12
+    if wrong.any():
+        raise InvalidIDError(f'Invalid BV ids at {numpy.flatnonzero(wrong).tolist()}.')
+    try:
+        chars = xs.astype('S12').view(numpy.uint8).reshape(-1, 12)
+    except UnicodeEncodeError:
+        raise InvalidIDError('Invalid BV ids, not ASCII.') from None
+    digits = codes[chars[:, s]]
+    fixed = numpy.frombuffer(b'bv1417', numpy.uint8)
+    # lower case the prefix "BV" only, the digits are case sensitive
+    chars_fixed = chars[:, [0, 1, 2, 5, 7, 9]] | numpy.array([32, 32, 0, 0, 0, 0], numpy.uint8)
+    valid = (digits >= 0).all(axis=1) & (chars_fixed == fixed).all(axis=1)
+    if not valid.all():
+        raise InvalidIDError(f'Invalid BV ids at {numpy.flatnonzero(~valid).tolist()}.')
+    return ((digits * numpy.array(powers)).sum(axis=1) - add) ^ xor
+
+
+def _av2bv_numpy(xs):
+    import numpy
+    xs = _ids_numpy(xs)
+    if xs.dtype.kind not in 'iu':
+        raise InvalidIDError(f'Invalid AV ids of dtype {xs.dtype}.')
+    xs = xs.astype(numpy.int64)
+    x = (xs ^ xor) + add
+    if ((xs <= 0) | (x < 0) | (x >= 58**6)).any():
+        raise InvalidIDError('AV ids out of range.')
+    chars = numpy.tile(numpy.frombuffer(b'BV1  4 1 7  ', numpy.uint8), (len(x), 1))
+    chars[:, s] = numpy.frombuffer(table.encode(), numpy.uint8)[x[:, None] // numpy.array(powers) % 58]
+    return chars.view('S12').ravel().astype(str)
+
+
+def _ids_numpy(xs):
+    # a single id is an array of one, a table of ids is ambiguous
+    import numpy
+    xs = numpy.atleast_1d(numpy.asarray(xs))
+    if xs.ndim != 1:
+        raise InvalidIDError(f'Expected a 1-d array of ids, got {xs.ndim} dimensions.')
+    return xs
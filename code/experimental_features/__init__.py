@@ -1,10 +1,22 @@
 #!/usr/bin/python3
-__all__ = ('LiveByArea', )
+__all__ = ('LiveByArea', 'LiveMonitor', 'OnlineHistory', 'live_areas', 'scan_areas')
 
 
+import importlib
 import warnings
 
-from .model import LiveByArea
+
+# names are imported from their module on first access
+_MODULES = dict(
+    LiveByArea='model', live_areas='model', scan_areas='model',
+    LiveMonitor='monitor', OnlineHistory='monitor',
+)
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return getattr(importlib.import_module(f'.{_MODULES[name]}', __name__), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 warnings.warn('This is experimental features, which is not stable.',
@@ -1,15 +1,14 @@
 import collections
-import faker
 import math
 import requests
 import time
 import warnings
 
 from selenium import webdriver
+from selenium.webdriver.support.wait import WebDriverWait
 
-
-
-F = faker.Faker()
+from bilibili.auto.tests import Auto
+from bilibili.utils.agents import user_agent
 
 
 
@@ -38,7 +37,7 @@ class User:
         self._session.headers.update({
             'host': 'api.bilibili.com',
             'referer': 'https://www.bilibili.com',
-            'user-agent': F.user_agent(),
+            'user-agent': user_agent(),
         })
         self.info = None
         info and self.set_info()
@@ -189,9 +188,11 @@ if __name__ == '__main__':
     browser.get('https://passport.bilibili.com/login')
     input('请扫码登录，成功后回车 >>> ')
     myself.set_cookies_from_selenium(browser)
+    auto = Auto(login=False, web_driver=browser)
+    loaded = lambda browser: browser.execute_script('return document.readyState') == 'complete'
     for following in myself.followings:
         browser.get(f'https://space.bilibili.com/{following.id}/')
-        time.sleep(3)
+        WebDriverWait(browser, 10).until(loaded)
         live = browser.find_elements_by_class_name('i-live-on')
         if live:
             try:
@@ -199,13 +200,7 @@ if __name__ == '__main__':
                 live_id = int(live_url.rsplit('/', 1)[-1])
                 response = requests.get(f'https://api.live.bilibili.com/xlive/web-room/v1/index/getInfoByRoom?room_id={live_id}')
                 if response.json()['data']['room_info']['area_name'] == '学习':
-                    browser.get(live_url)
-                    time.sleep(5)
-                    for text in texts:
-                        browser.find_element_by_class_name('chat-input.border-box').send_keys(text)
-                        time.sleep(3)
-                        browser.find_element_by_class_name('txt').click()
-                    time.sleep(3)
+                    auto.greet_live_room(live_url, texts)
                     send_url = 'https://api.live.bilibili.com/gift/v2/Live/send'
                     myself._session.headers['host'] = 'api.live.bilibili.com'
                     myself._session.headers['referer'] = live_url
@@ -1,6 +1,12 @@
 #!/usr/bin/python3
 import collections
-import requests
+import concurrent.futures
+import itertools
+import math
+import warnings
+
+from bilibili.utils.prefetch import prefetch
+from bilibili.utils.transport import get_transport
 
 
 
@@ -11,11 +17,19 @@ LiveRoom = collections.namedtuple('LiveRoom', ('id', 'name', 'online', 'area'))
 class LiveByArea:
     '''Live model of Bilibili.
 
+    Pages are requested `window` at a time with the largest page size the
+    API accepts. Rooms are deduplicated by id while streaming, since the
+    list is re-sorted as rooms go on or off line.
+
     Argument:
         - id: [int, str], tag id, default is 27 (study area)
+        - page_size: int, rooms per page, the API accepts at most 99
+        - window: int, number of pages requested at the same time
     '''
-    def __init__(self, id=27):
+    def __init__(self, id=27, page_size=99, window=4):
         self.id = id
+        self.page_size = page_size
+        self.window = window
 
 
     def __repr__(self):
@@ -33,16 +47,78 @@ class LiveByArea:
         yield from self._get_rooms()
 
 
-    def _get_rooms(self, pn=30):
+    def _get_rooms(self):
         keys = ('roomid', 'uname', 'online', 'area_name')
+        data = self._page_at(1)
+        first = data['list'] or []
+        # the server may cap the page size, the first page tells; `count`
+        # bounds the pages, without it a short first page is the only one
+        size, count = len(first), data.get('count')
+        if not size or count is None and size < self.page_size:
+            numbers = range(0)
+        elif count is not None:
+            numbers = range(2, math.ceil(count/size)+1)
+        else:
+            numbers = itertools.count(2)
+        pages = itertools.chain((first, ), prefetch(self._rooms_at, numbers, self.window))
+        seen = set()
+        for rooms in pages:
+            new = 0
+            for room in rooms:
+                if room['roomid'] not in seen:
+                    seen.add(room['roomid'])
+                    new += 1
+                    yield LiveRoom(*(room[key] for key in keys))
+            # a short page is the last one, a page of known rooms only
+            # means the list moved under us
+            if len(rooms) < size or not new:
+                break
+
+
+    def _rooms_at(self, page):
+        return self._page_at(page)['list'] or []
+
+
+    def _page_at(self, page):
         url = 'https://api.live.bilibili.com/room/v3/area/getRoomList'
-        params = dict(area_id=self.id, page=1, page_size=pn)
-        response = requests.get(url, params=params)
-        data = response.json()['data']
-        count = data['count']
-        while count:
-            for room in data['list']:
-                count -= 1
-                yield LiveRoom(*(room[key] for key in keys))
-            params['page'] += 1
-            data = requests.get(url, params=params).json()['data']
+        params = dict(area_id=self.id, page=page, page_size=self.page_size)
+        return get_transport().get_json(url, params=params)['data']
+
+
+
+def live_areas():
+    '''Return ids of every live area
+
+    Example:
+        >>> rooms = list(scan_areas(live_areas()))
+    '''
+    url = 'https://api.live.bilibili.com/room/v1/Area/getList'
+    data = get_transport().get_json(url)['data']
+    return [int(area['id']) for parent in data for area in parent['list']]
+
+
+def scan_areas(areas=None, workers=8, page_size=99, window=4):
+    '''Iterate live rooms of many areas, each room once, with `workers`
+    areas scanned at the same time; every area when `areas` is None
+
+    Rooms of an area are yielded once the whole area is scanned.
+
+    Example:
+        >>> for room in scan_areas([27, 86, 145]):
+        ...     print(room)
+    '''
+    areas = live_areas() if areas is None else areas
+    scan = lambda id: list(LiveByArea(id, page_size, window).rooms)
+    seen = set()
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = {executor.submit(scan, id): id for id in areas}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                rooms = future.result()
+            except Exception as e:
+                warnings.warn(f'Failed to scan area {futures[future]}: {e}', Warning)
+                continue
+            for room in rooms:
+                if room.id not in seen:
+                    seen.add(room.id)
+                    yield room
@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+import array
+import collections
+import concurrent.futures
+import time
+import warnings
+
+from bilibili.utils.schedule import run_every
+from .model import LiveByArea
+
+
+
+RoomEvent = collections.namedtuple('RoomEvent', ('kind', 'id', 'timestamp', 'online', 'delta'))
+
+
+
+class OnlineHistory:
+    '''Online counts of each room, kept in array-backed ring buffers
+
+    Only changes are recorded, so a buffer of `capacity` samples spans as
+    long as the count of the room keeps still. The least recently changed
+    rooms are forgotten beyond `max_rooms`.
+
+    Argument:
+        - capacity: int, samples kept per room
+        - max_rooms: [int, None], number of rooms kept
+
+    Example:
+        >>> history[21452505]
+        [(1585000000, 1200), (1585000060, 1350)]
+    '''
+    def __init__(self, capacity=120, max_rooms=100000):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self._rooms = collections.OrderedDict()
+
+
+    def __repr__(self):
+        return f'<OnlineHistory @ {len(self._rooms)} rooms>'
+
+
+    def __len__(self):
+        return len(self._rooms)
+
+
+    def __contains__(self, id):
+        return id in self._rooms
+
+
+    def __getitem__(self, id):
+        return list(self._rooms[id])
+
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self._rooms.values())
+
+
+    def record(self, id, timestamp, online):
+        ring = self._rooms.get(id)
+        if ring is None:
+            ring = self._rooms[id] = _Ring(self.capacity)
+            if self.max_rooms and len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+        else:
+            self._rooms.move_to_end(id)
+        ring.append(timestamp, online)
+
+
+
+class _Ring:
+    # grows up to `capacity`, then overwrites the oldest sample
+    __slots__ = ('capacity', 'times', 'values', 'start')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array.array('I')
+        self.values = array.array('I')
+        self.start = 0
+
+
+    def __iter__(self):
+        for index in range(len(self.times)):
+            index = (self.start+index) % len(self.times)
+            yield self.times[index], self.values[index]
+
+
+    @property
+    def nbytes(self):
+        return self.times.itemsize*len(self.times) + self.values.itemsize*len(self.values)
+
+
+    def append(self, timestamp, online):
+        if len(self.times) < self.capacity:
+            self.times.append(timestamp)
+            self.values.append(online)
+        else:
+            self.times[self.start] = timestamp
+            self.values[self.start] = online
+            self.start = (self.start+1) % self.capacity
+
+
+
+class LiveMonitor:
+    '''Poll live areas and emit only what changed since the last poll
+
+    Events are `RoomEvent(kind, id, timestamp, online, delta)` with kind
+    'started', 'ended' or 'online'; an online change is emitted when it
+    is at least `threshold`. The first scan of an area is a baseline: its
+    rooms already live are recorded in the history but not reported as
+    started. When an area fails to scan, its rooms keep their previous
+    state instead of being reported as ended.
+
+    Argument:
+        - areas: iterable of int, live area ids
+        - threshold: int, smallest online change emitted
+        - capacity: int, samples kept per room, see `OnlineHistory`
+        - max_rooms: [int, None], rooms kept in the history
+        - workers: int, number of areas scanned at the same time
+
+    API:
+        - property
+            - history: OnlineHistory
+        - function
+            - poll() -> list of RoomEvent
+            - run(interval, callback, rounds)
+
+    Example:
+        >>> monitor = LiveMonitor([27, 86], threshold=100)
+        >>> monitor.run(interval=60, callback=print)
+    '''
+    def __init__(self, areas, threshold=1, capacity=120, max_rooms=100000, workers=8):
+        self.areas = list(areas)
+        self.threshold = threshold
+        self.workers = workers
+        self.history = OnlineHistory(capacity, max_rooms)
+        self.rooms = dict()   # {room id: LiveRoom} of the last poll
+        self._areas = dict()  # {area id: {room id: LiveRoom}}
+
+
+    def __repr__(self):
+        return f'<LiveMonitor @ {len(self.rooms)} rooms>'
+
+
+    def poll(self):
+        timestamp = int(time.time())
+        baseline = set()  # rooms of areas scanned for the first time
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            futures = {executor.submit(self._scan, id): id for id in self.areas}
+            for future in concurrent.futures.as_completed(futures):
+                id = futures[future]
+                try:
+                    area = future.result()
+                except Exception as e:
+                    warnings.warn(f'Failed to scan area {id}: {e}', Warning)
+                    continue
+                if id not in self._areas:
+                    baseline.update(area)
+                self._areas[id] = area
+        rooms = dict()
+        for area in self._areas.values():
+            rooms.update(area)
+        events = list(self._diff(self.rooms, rooms, timestamp, baseline))
+        self.rooms = rooms
+        return events
+
+
+    def run(self, interval=60, callback=print, rounds=None):
+        '''Poll every `interval` seconds and call `callback(event)` for each
+        event, `rounds` times or forever
+        '''
+        run_every(self.poll, interval, callback, rounds)
+
+
+    def _scan(self, id):
+        return {room.id: room for room in LiveByArea(id).rooms}
+
+
+    def _diff(self, old, new, timestamp, baseline):
+        for id, room in new.items():
+            previous = old.get(id)
+            if previous is None:
+                self.history.record(id, timestamp, room.online)
+                if id not in baseline:
+                    yield RoomEvent('started', id, timestamp, room.online, room.online)
+                continue
+            delta = room.online - previous.online
+            if delta and abs(delta) >= self.threshold:
+                self.history.record(id, timestamp, room.online)
+                yield RoomEvent('online', id, timestamp, room.online, delta)
+            elif delta:
+                # below the threshold, compare later changes to the last emitted count
+                new[id] = previous
+        for id, room in old.items():
+            if id not in new:
+                self.history.record(id, timestamp, 0)
+                yield RoomEvent('ended', id, timestamp, 0, -room.online)
@@ -1,8 +1,6 @@
 #!/usr/bin/python3
-from time import sleep
-from selenium import webdriver
-
 from bilibili.auto import tests
+from bilibili.auto.pool import BrowserPool
 
 Auto = tests.Auto
 
@@ -11,6 +9,7 @@ from experimental_features import LiveByArea
 
 if __name__ == '__main__':
     # IPython >>> %run -i main.py
+    from selenium import webdriver
     ## Cache the webdriver
     if 'browser' not in locals():
         browser = webdriver.Chrome()
@@ -22,28 +21,13 @@ if __name__ == '__main__':
     browser.get('https://passport.bilibili.com/login')
     input('Please login >>> ')
     live = LiveByArea(27)
-    urls = dict()
-    tag = 'room-owner-username.live-skin-normal-a-text.dp-i-block.v-middle'
-    for url in live.urls:
-        if url in urls:
-            continue
-        else:
-            urls[url] = None
-        try:
-            browser.get(url)
-            sleep(5)
-            user_name = browser.find_elements_by_class_name(tag)[0].text
-            texts = (
-                f'晚上好呀，{user_name}～',
-                '记得按时吃晚饭呀，加油！',
-            )
-            for text in texts:
-                browser.find_element_by_class_name('chat-input.border-box') \
-                    .send_keys(text)
-                sleep(3)
-                browser.find_element_by_class_name('txt') \
-                    .click()
-        except Exception as e:
-            print(e)
-            continue
-        sleep(3)
+    texts = lambda user_name: (
+        f'晚上好呀，{user_name}～',
+        '记得按时吃晚饭呀，加油！',
+    )
+    greet = lambda auto, url: auto.greet_live_room(url, texts)
+    # rooms come deduplicated from the scanner, greeted by headless
+    # browsers sharing the login of this one
+    with BrowserPool(4, cookies=browser.get_cookies()) as pool:
+        for url, user_name in pool.map(greet, live.urls):
+            print(user_name, url)